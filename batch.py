@@ -0,0 +1,51 @@
+import time
+STARTED_AT= time.perf_counter()
+
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+from data.data_fetcher import DataFetcher
+from llm.batch_runner import BATCH_RETRIEVAL_WORKERS, BATCH_WINDOW, BatchRunner
+from llm.llama_model import LlamaModel
+from services.embedder import Embedder
+from services.qdrant_wrapper import QdrantWrapper
+from services.sqlite_wrapper import SqliteWrapper
+from services.startup import StartupLoader
+
+
+def main():
+    parser= argparse.ArgumentParser(description= "Answer a JSONL file of queries and write answers plus timings to JSONL.")
+    parser.add_argument("input", help= "JSONL file with one query object per line")
+    parser.add_argument("output", help= "JSONL answers file; existing ids are skipped so an interrupted run resumes")
+    parser.add_argument("--query-field", default= "query")
+    parser.add_argument("--id-field", default= "id")
+    parser.add_argument("--limit", type= int, default= 3)
+    parser.add_argument("--min-score", type= float, default= 0.80)
+    parser.add_argument("--window", type= int, default= BATCH_WINDOW, help= "queries resolved and prefetched ahead of the LLM per step")
+    parser.add_argument("--workers", type= int, default= BATCH_RETRIEVAL_WORKERS)
+    args= parser.parse_args()
+
+    startup= StartupLoader(started_at= STARTED_AT)
+    startup.mark("imports")
+    sqlite= SqliteWrapper()
+    embedder= Embedder(sqlite= sqlite)
+    qdrant= QdrantWrapper(embedder= embedder, sqlite= sqlite)
+    fetcher= DataFetcher(sqlite= sqlite, qdrant= qdrant, embedder= embedder)
+    llm= LlamaModel(fetcher= fetcher, sqlite= sqlite, qdrant= qdrant)
+    startup.submit("embedder", lambda: embedder.model)
+    startup.submit("qdrant", lambda: qdrant.store)
+    startup.submit("llm", lambda: llm.llm)
+    startup.on_ready(lambda loader: print(loader.report()))
+    runner= BatchRunner(llm, limit= args.limit, min_score= args.min_score, window= args.window, workers= args.workers)
+    try:
+        count= runner.run(args.input, args.output, query_field= args.query_field, id_field= args.id_field)
+    finally:
+        runner.close()
+        qdrant.close()
+        sqlite.flush_access_times()
+    print(f"Answered {count} queries.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
+import re
+import numpy as np
+
+
+def token_hash(token: str, buckets: int) -> int:
+    return zlib.crc32(token.encode("utf-8")) % buckets
+
+
+class FakeSentenceTransformer:
+
+    def __init__(self, dim: int= 384, latency_per_batch: float= 0.0, latency_per_item: float= 0.0):
+        self.dim= dim
+        self.latency_per_batch= latency_per_batch
+        self.latency_per_item= latency_per_item
+        self.calls= 0
+        self.items= 0
+
+    def encode(self, texts: List[str], batch_size: int= 32) -> np.ndarray:
+        self.calls += 1
+        self.items += len(texts)
+        batches= (len(texts) + batch_size - 1) // max(1, batch_size)
+        delay= batches * self.latency_per_batch + len(texts) * self.latency_per_item
+        if delay:
+            time.sleep(delay)
+        out= np.zeros((len(texts), self.dim), dtype= np.float32)
+        for i, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                out[i, token_hash(token, self.dim)] += 1.0
+            norm= np.linalg.norm(out[i])
+            if norm:
+                out[i] /= norm
+        return out
+
+
+class FakeLlama:
+
+    def __init__(self, prefill_per_token: float= 0.0, decode_per_token: float= 0.0, max_output_tokens: int= 60, vocab: int= 32000, n_ctx: int= 4096):
+        self.prefill_per_token= prefill_per_token
+        self.decode_per_token= decode_per_token
+        self.max_output_tokens= max_output_tokens
+        self.vocab= vocab
+        # Like llama_cpp.Llama, input_ids is the whole n_ctx buffer and only the first n_tokens are live;
+        # truncating n_tokens leaves stale ids behind it.
+        self.input_ids= np.zeros(n_ctx, dtype= np.intc)
+        self.n_tokens= 0
+        self.prefilled= 0
+        self.decoded= 0
+
+    def tokenize(self, text: bytes, add_bos: bool= True, special: bool= False) -> List[int]:
+        words= re.findall(r"\S+", text.decode("utf-8"))
+        ids= [1 + token_hash(w, self.vocab - 1) for w in words]
+        return ([0] if add_bos else []) + ids
+
+    def reset(self) -> None:
+        self.n_tokens= 0
+
+    def eval(self, tokens: Sequence[int]) -> None:
+        if self.prefill_per_token:
+            time.sleep(len(tokens) * self.prefill_per_token)
+        self.prefilled += len(tokens)
+        self.input_ids[self.n_tokens:self.n_tokens + len(tokens)]= tokens
+        self.n_tokens += len(tokens)
+
+    def save_state(self) -> Tuple[np.ndarray, int]:
+        return self.input_ids.copy(), self.n_tokens
+
+    def load_state(self, state: Tuple[np.ndarray, int]) -> None:
+        self.input_ids= state[0].copy()
+        self.n_tokens= state[1]
+
+    def generate_text(self, prompt: Union[str, List[int]], max_tokens: int) -> Iterator[str]:
+        tokens= self.tokenize(prompt.encode("utf-8")) if isinstance(prompt, str) else list(prompt)
+        reuse= 0
+        for a, b in zip(self.input_ids[:self.n_tokens], tokens):
+            if a != b:
+                break
+            reuse += 1
+        self.n_tokens= reuse
+        self.eval(tokens[reuse:])
+        for i in range(min(max_tokens, self.max_output_tokens)):
+            if self.decode_per_token:
+                time.sleep(self.decode_per_token)
+            self.decoded += 1
+            self.eval_decoded(1 + i)
+            yield "word "
+
+    def eval_decoded(self, token: int) -> None:
+        self.input_ids[self.n_tokens]= token
+        self.n_tokens += 1
+
+    def __call__(self, prompt: Union[str, List[int]], stream: bool= False, max_tokens: int= 300, **kwargs: Any):
+        chunks= self.generate_text(prompt, max_tokens)
+        if stream:
+            return ({"choices": [{"text": text}]} for text in chunks)
+        return {"choices": [{"text": "".join(chunks)}]}
+
+    def stats(self) -> Dict[str, int]:
+        return {"prefilled": self.prefilled, "decoded": self.decoded}
@@ -0,0 +1,159 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from data.entity_parser import collect_label_ids
+from data.wikidata_client import WikidataClient
+
+FULL_PROPS= "info|labels|descriptions|aliases|sitelinks|claims"
+
+
+def generate_fixtures(n_entities: int, n_facts: int, n_properties: int= 40, seed: int= 7) -> Dict[str, Dict[str, Any]]:
+    rng= random.Random(seed)
+    entities: Dict[str, Dict[str, Any]]= {}
+
+    for p in range(1, n_properties + 1):
+        pid= f"P{p}"
+        entities[pid]= {"id": pid, "type": "property", "labels": {"en": {"language": "en", "value": f"property {p}"}}}
+
+    for i in range(1, n_entities + 1):
+        qid= f"Q{i}"
+        claims: Dict[str, List[Dict[str, Any]]]= {}
+        for f in range(n_facts):
+            pid= f"P{rng.randint(1, n_properties)}"
+            kind= f % 3
+            if kind == 0:
+                datavalue= {"type": "wikibase-entityid", "value": {"entity-type": "item", "id": f"Q{rng.randint(1, n_entities)}"}}
+            elif kind == 1:
+                datavalue= {"type": "string", "value": f"value {rng.randint(0, 10 ** 6)}"}
+            else:
+                datavalue= {"type": "time", "value": {"time": f"+{rng.randint(1000, 2024)}-01-01T00:00:00Z", "precision": 9}}
+            claims.setdefault(pid, []).append({
+                "id": f"{qid}$fixture-{f}",
+                "rank": rng.choice(["normal", "normal", "preferred"]),
+                "mainsnak": {"snaktype": "value", "property": pid, "datavalue": datavalue},
+                "references": [{"snaks": {"P1": [{"datavalue": {"type": "string", "value": "ref " * 20}}]}}],
+            })
+        entities[qid]= {
+            "id": qid,
+            "type": "item",
+            "lastrevid": 1000 + i,
+            "modified": "2024-01-01T00:00:00Z",
+            "labels": {"en": {"language": "en", "value": f"Entity {i}"}},
+            "descriptions": {"en": {"language": "en", "value": f"synthetic benchmark entity number {i}"}},
+            "aliases": {"en": [{"language": "en", "value": f"Alias {i}"}]},
+            "sitelinks": {"enwiki": {"site": "enwiki", "title": f"Entity {i}"}},
+            "claims": claims,
+        }
+    return entities
+
+
+def save_fixtures(entities: Dict[str, Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding= "utf-8") as f:
+        json.dump(entities, f, ensure_ascii= False)
+
+
+def load_fixtures(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding= "utf-8") as f:
+        return json.load(f)
+
+
+def write_dump(entities: Dict[str, Dict[str, Any]], path: str) -> None:
+    items= [e for e in entities.values() if e.get("type") == "item"]
+    with open(path, "w", encoding= "utf-8") as f:
+        f.write("[\n")
+        for i, e in enumerate(items):
+            f.write(json.dumps(e, ensure_ascii= False) + (",\n" if i < len(items) - 1 else "\n"))
+        f.write("]\n")
+
+
+def record_fixtures(qids: List[str], path: str, api_url: Optional[str]= None) -> Dict[str, Dict[str, Any]]:
+    client= WikidataClient(api_url= api_url) if api_url else WikidataClient()
+    entities= client.get_entities(qids, props= FULL_PROPS)
+    pid_set, value_qids= collect_label_ids(entities.values())
+    label_ids= [i for i in sorted(pid_set | value_qids) if i not in entities]
+    entities.update(client.get_entities(label_ids, props= "labels"))
+    save_fixtures(entities, path)
+    client.close()
+    return entities
+
+
+def select_props(entity: Dict[str, Any], props: List[str]) -> Dict[str, Any]:
+    keep= {"id", "type"}
+    if "info" in props:
+        keep |= {"lastrevid", "modified"}
+    keep |= set(props)
+    return {k: v for k, v in entity.items() if k in keep}
+
+
+class FixtureServer:
+
+    def __init__(self, entities: Dict[str, Dict[str, Any]], latency: float= 0.0):
+        self.entities= entities
+        self.latency= latency
+        self.requests= 0
+        self.bytes_sent= 0
+        self.lock= threading.Lock()
+        self.httpd: Optional[ThreadingHTTPServer]= None
+        self.thread: Optional[threading.Thread]= None
+
+    def handle(self, params: Dict[str, str]) -> Dict[str, Any]:
+        action= params.get("action")
+        if action == "wbgetentities":
+            props= params.get("props", FULL_PROPS).split("|")
+            result= {}
+            for wid in params.get("ids", "").split("|"):
+                e= self.entities.get(wid)
+                result[wid]= select_props(e, props) if e else {"id": wid, "missing": ""}
+            return {"entities": result, "success": 1}
+        if action == "wbsearchentities":
+            needle= params.get("search", "").strip().lower()
+            limit= int(params.get("limit", 7))
+            hits= []
+            for wid, e in self.entities.items():
+                label= e.get("labels", {}).get("en", {}).get("value", "")
+                if e.get("type") == "item" and label.lower().startswith(needle):
+                    hits.append({"id": wid, "label": label})
+                    if len(hits) >= limit:
+                        break
+            return {"search": hits, "success": 1}
+        return {"error": {"code": "badvalue", "info": f"unsupported action {action}"}}
+
+    def start(self) -> str:
+        server= self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version= "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                query= parse_qs(urlparse(self.path).query)
+                body= json.dumps(server.handle({k: v[0] for k, v in query.items()})).encode("utf-8")
+                with server.lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd= ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads= True
+        self.thread= threading.Thread(target= self.httpd.serve_forever, name= "fixture-server", daemon= True)
+        self.thread.start()
+        return f"http://127.0.0.1:{self.httpd.server_port}/w/api.php"
+
+    def stop(self) -> None:
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd= None
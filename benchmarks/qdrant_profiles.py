@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.run import summarize
+from services.qdrant_wrapper import QDRANT_PROFILES, QdrantVectorStore, profile_from_env
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers= rng.normal(size= (clusters, dim)).astype(np.float32)
+    vectors= centers[rng.integers(0, clusters, size= n)] + 0.35 * rng.normal(size= (n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis= 1, keepdims= True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    scores= queries @ vectors.T
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+def wait_for_index(store: QdrantVectorStore, collection: str, timeout: float) -> None:
+    deadline= time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info= store.client.get_collection(collection)
+        if str(getattr(info.status, "value", info.status)).lower() == "green":
+            return
+        time.sleep(0.5)
+
+
+def run_profile(client: Any, name: str, vectors: np.ndarray, queries: np.ndarray, truth: List[List[int]], args: argparse.Namespace) -> Dict[str, Any]:
+    store= QdrantVectorStore(client= client, profile= profile_from_env(name))
+    collection= f"{args.prefix}_{name.replace('-', '_')}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+
+    started= time.perf_counter()
+    store.ensure_collection(collection, vectors.shape[1])
+    qids= [f"Q{i}" for i in range(len(vectors))]
+    for i in range(0, len(vectors), args.batch_size):
+        batch= range(i, min(i + args.batch_size, len(vectors)))
+        store.upsert(collection, [qids[j] for j in batch], [vectors[j].tolist() for j in batch], [{"qid": qids[j]} for j in batch], wait= True)
+    wait_for_index(store, collection, args.index_timeout)
+    build= time.perf_counter() - started
+
+    latencies= []
+    recalls= []
+    search_started= time.perf_counter()
+    for query, expected in zip(queries, truth):
+        t= time.perf_counter()
+        hits= store.search(collection, query, args.k, -1.0)
+        latencies.append(time.perf_counter() - t)
+        found= {int(qid[1:]) for qid, _score in hits if qid}
+        recalls.append(len(found & set(expected)) / len(expected))
+    wall= time.perf_counter() - search_started
+
+    if not args.keep:
+        client.delete_collection(collection)
+    return {
+        "profile": vars(store.profile),
+        "build_s": build,
+        f"recall@{args.k}": float(np.mean(recalls)),
+        "search": summarize(latencies, wall),
+    }
+
+
+def main(argv: Optional[List[str]]= None) -> None:
+    parser= argparse.ArgumentParser(description= "Compare recall and latency of Qdrant collection profiles against exact search.")
+    parser.add_argument("--profiles", default= ",".join(QDRANT_PROFILES))
+    parser.add_argument("--host", default= None, help= "Qdrant host (default: in-process local mode, which ignores HNSW and quantization)")
+    parser.add_argument("--port", type= int, default= 6333)
+    parser.add_argument("--vectors", type= int, default= 20000)
+    parser.add_argument("--dim", type= int, default= 384)
+    parser.add_argument("--clusters", type= int, default= 200)
+    parser.add_argument("--queries", type= int, default= 200)
+    parser.add_argument("--k", type= int, default= 10)
+    parser.add_argument("--batch-size", type= int, default= 512)
+    parser.add_argument("--index-timeout", type= float, default= 300)
+    parser.add_argument("--prefix", default= "bench_profile")
+    parser.add_argument("--keep", action= "store_true", help= "keep the benchmark collections afterwards")
+    parser.add_argument("--seed", type= int, default= 7)
+    parser.add_argument("--out", default= "bench_qdrant_profiles.json")
+    args= parser.parse_args(argv)
+
+    from qdrant_client import QdrantClient
+    client= QdrantClient(args.host, port= args.port) if args.host else QdrantClient(":memory:")
+
+    rng= np.random.default_rng(args.seed)
+    vectors= clustered_vectors(args.vectors, args.dim, args.clusters, rng)
+    queries= vectors[rng.integers(0, len(vectors), size= args.queries)] + 0.1 * rng.normal(size= (args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis= 1, keepdims= True)
+    truth= exact_top_k(vectors, queries, args.k)
+
+    results: Dict[str, Any]= {"config": vars(args), "created_at": time.time(), "profiles": {}}
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        result= run_profile(client, name, vectors, queries, truth, args)
+        results["profiles"][name]= result
+        search= result["search"]
+        print(f"[bench] {name:<10} recall@{args.k} {result[f'recall@{args.k}']:.3f}  p50 {search['p50_ms']:.2f} ms  p95 {search['p95_ms']:.2f} ms  build {result['build_s']:.1f}s")
+
+    with open(args.out, "w", encoding= "utf-8") as f:
+        json.dump(results, f, indent= 2)
+    print(f"[bench] results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+from collections import defaultdict
+import functools
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fakes import FakeLlama, FakeSentenceTransformer
+from benchmarks.fixtures import FixtureServer, generate_fixtures, load_fixtures, write_dump
+from data.data_fetcher import DataFetcher
+from data.dump_importer import DumpImporter
+from data.wikidata_client import WikidataClient
+from llm.llama_model import LlamaModel
+from services.embedder import Embedder
+from services.local_vector_store import LocalVectorStore
+from services.qdrant_wrapper import QdrantWrapper
+from services.sqlite_wrapper import SqliteWrapper
+from services.tracing import tracer
+
+STAGES= [
+    ("fetcher", "get_or_fetch_wikidata_entities_by_qids", "fetcher.get_or_fetch"),
+    ("fetcher", "fetch_wikidata_entities_by_qids", "fetcher.fetch_entities"),
+    ("fetcher", "fetch_property_labels", "fetcher.labels"),
+    ("fetcher", "search_for_qid", "fetcher.search"),
+    ("sqlite", "get_entities", "sqlite.get_entities"),
+    ("sqlite", "get_display_lines", "sqlite.get_display_lines"),
+    ("sqlite", "upsert_entities", "sqlite.upsert_entities"),
+    ("sqlite", "refresh_entities", "sqlite.refresh_entities"),
+    ("qdrant", "search_entities", "qdrant.search_entities"),
+    ("qdrant", "upsert_entities", "qdrant.upsert_entities"),
+    ("llm", "retrieve", "llm.retrieve"),
+    ("llm", "prepare_prompt", "llm.prepare_prompt"),
+    ("llm", "rag_ask", "llm.rag_ask"),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered= sorted(values)
+    if not ordered:
+        return 0.0
+    k= (len(ordered) - 1) * pct / 100
+    lo= int(k)
+    hi= min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values: List[float], wall: float) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "total_s": sum(values),
+        "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "calls_per_s": len(values) / wall if wall > 0 else 0.0,
+    }
+
+
+class StageRecorder:
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]]= defaultdict(list)
+        self.lock= threading.Lock()
+
+    def wrap(self, obj: Any, method: str, stage: str) -> None:
+        original: Callable= getattr(obj, method)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started= time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed= time.perf_counter() - started
+                with self.lock:
+                    self.timings[stage].append(elapsed)
+
+        setattr(obj, method, timed)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timings= defaultdict(list)
+
+    def report(self, wall: float) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {stage: summarize(values, wall) for stage, values in sorted(self.timings.items())}
+
+
+class Stack:
+
+    def __init__(self, workdir: str, api_url: str, args: argparse.Namespace):
+        self.sqlite= SqliteWrapper(os.path.join(workdir, "cache.sqlite"))
+        self.embed_model= FakeSentenceTransformer(latency_per_batch= args.embed_batch_latency, latency_per_item= args.embed_item_latency)
+        self.embedder= Embedder(sqlite= self.sqlite, model_name= "fake-embedder", model= self.embed_model)
+        self.qdrant= QdrantWrapper(embedder= self.embedder, sqlite= self.sqlite, store= LocalVectorStore(os.path.join(workdir, "vectors")))
+        self.client= WikidataClient(api_url= api_url, maxlag= None)
+        self.fetcher= DataFetcher(sqlite= self.sqlite, qdrant= self.qdrant, embedder= self.embedder, client= self.client)
+        self.fake_llm= FakeLlama(prefill_per_token= args.prefill_latency, decode_per_token= args.decode_latency, max_output_tokens= args.output_tokens)
+        self.llm= LlamaModel(fetcher= self.fetcher, sqlite= self.sqlite, qdrant= self.qdrant, llm= self.fake_llm)
+        self.recorder= StageRecorder()
+        parts= {"fetcher": self.fetcher, "sqlite": self.sqlite, "qdrant": self.qdrant, "llm": self.llm}
+        for part, method, stage in STAGES:
+            self.recorder.wrap(parts[part], method, stage)
+
+    def close(self) -> None:
+        self.client.close()
+        self.qdrant.close()
+
+
+def run_queries(stack: Stack, queries: List[str]) -> Dict[str, Any]:
+    stack.recorder.reset()
+    latencies= []
+    started= time.perf_counter()
+    for q in queries:
+        t= time.perf_counter()
+        stack.llm.rag_ask(q)
+        latencies.append(time.perf_counter() - t)
+    wall= time.perf_counter() - started
+    return {
+        "wall_s": wall,
+        "queries": len(queries),
+        "end_to_end": summarize(latencies, wall),
+        "stages": stack.recorder.report(wall),
+    }
+
+
+def scenario_cache(workdir: str, api_url: str, args: argparse.Namespace, server: FixtureServer) -> Dict[str, Any]:
+    stack= Stack(workdir, api_url, args)
+    queries= [f"Entity {i}" for i in range(1, args.queries + 1)]
+    try:
+        before= server.requests
+        cold= run_queries(stack, queries)
+        cold["http_requests"]= server.requests - before
+        before= server.requests
+        warm= run_queries(stack, queries)
+        warm["http_requests"]= server.requests - before
+        warm["llm"]= stack.fake_llm.stats()
+        warm["embedding_cache"]= stack.embedder.cache.stats()
+    finally:
+        stack.close()
+    return {"cold": cold, "warm": warm}
+
+
+def scenario_ingest_api(workdir: str, api_url: str, args: argparse.Namespace, server: FixtureServer) -> Dict[str, Any]:
+    stack= Stack(workdir, api_url, args)
+    qids= [f"Q{i}" for i in range(1, args.entities + 1)]
+    stack.recorder.reset()
+    before= server.requests
+    started= time.perf_counter()
+    try:
+        for i in range(0, len(qids), args.batch_size):
+            stack.fetcher.get_or_fetch_wikidata_entities_by_qids(qids[i:i + args.batch_size])
+        wall= time.perf_counter() - started
+    finally:
+        stack.close()
+    return {
+        "wall_s": wall,
+        "entities": len(qids),
+        "entities_per_s": len(qids) / wall if wall else 0.0,
+        "http_requests": server.requests - before,
+        "stages": stack.recorder.report(wall),
+    }
+
+
+def scenario_ingest_dump(workdir: str, api_url: str, args: argparse.Namespace, fixtures: Dict[str, Any]) -> Dict[str, Any]:
+    stack= Stack(workdir, api_url, args)
+    dump_path= os.path.join(workdir, "dump.json")
+    write_dump(fixtures, dump_path)
+    importer= DumpImporter(stack.fetcher, batch_size= args.batch_size, workers= args.workers)
+    stack.recorder.reset()
+    started= time.perf_counter()
+    try:
+        count= importer.import_dump(dump_path)
+        wall= time.perf_counter() - started
+    finally:
+        stack.close()
+    return {
+        "wall_s": wall,
+        "entities": count,
+        "entities_per_s": count / wall if wall else 0.0,
+        "facts_per_s": importer.facts / wall if wall else 0.0,
+        "stages": stack.recorder.report(wall),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    for name, result in current["scenarios"].items():
+        phases= result if "stages" not in result else {"": result}
+        base_phases= baseline.get("scenarios", {}).get(name, {})
+        base_phases= base_phases if "stages" not in base_phases else {"": base_phases}
+        for phase, data in phases.items():
+            base= base_phases.get(phase) or {}
+            for stage, stats in data.get("stages", {}).items():
+                old= (base.get("stages") or {}).get(stage)
+                if not old or not old["p50_ms"]:
+                    continue
+                change= (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+                label= f"{name}.{phase}" if phase else name
+                print(f"{label:<22} {stage:<28} p50 {old['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms ({change:+.1f}%)")
+
+
+def main(argv: Optional[List[str]]= None) -> None:
+    parser= argparse.ArgumentParser(description= "Offline end-to-end benchmarks with local stand-ins for Wikidata, Qdrant and the LLM.")
+    parser.add_argument("--scenarios", default= "cache,ingest_api,ingest_dump")
+    parser.add_argument("--entities", type= int, default= 200)
+    parser.add_argument("--facts", type= int, default= 50)
+    parser.add_argument("--queries", type= int, default= 20)
+    parser.add_argument("--batch-size", type= int, default= 50)
+    parser.add_argument("--workers", type= int, default= 2)
+    parser.add_argument("--fixtures", default= None, help= "JSON file of recorded wbgetentities entities (default: synthetic)")
+    parser.add_argument("--http-latency", type= float, default= 0.02)
+    parser.add_argument("--embed-batch-latency", type= float, default= 0.005)
+    parser.add_argument("--embed-item-latency", type= float, default= 0.001)
+    parser.add_argument("--prefill-latency", type= float, default= 0.0002)
+    parser.add_argument("--decode-latency", type= float, default= 0.002)
+    parser.add_argument("--output-tokens", type= int, default= 60)
+    parser.add_argument("--out", default= "bench_results.json")
+    parser.add_argument("--baseline", default= None, help= "previous results JSON to compare against")
+    parser.add_argument("--trace", default= None, help= "enable per-stage tracing and append per-query traces to this JSON-lines file")
+    args= parser.parse_args(argv)
+    if args.trace:
+        tracer.enable(trace_file= args.trace)
+
+    fixtures= load_fixtures(args.fixtures) if args.fixtures else generate_fixtures(args.entities, args.facts)
+    server= FixtureServer(fixtures, latency= args.http_latency)
+    api_url= server.start()
+    results: Dict[str, Any]= {"config": vars(args), "created_at": time.time(), "scenarios": {}}
+
+    try:
+        for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+            workdir= tempfile.mkdtemp(prefix= f"bench-{name}-")
+            try:
+                if name == "cache":
+                    results["scenarios"][name]= scenario_cache(workdir, api_url, args, server)
+                elif name == "ingest_api":
+                    results["scenarios"][name]= scenario_ingest_api(workdir, api_url, args, server)
+                elif name == "ingest_dump":
+                    results["scenarios"][name]= scenario_ingest_dump(workdir, api_url, args, fixtures)
+                else:
+                    raise SystemExit(f"unknown scenario {name}")
+            finally:
+                shutil.rmtree(workdir, ignore_errors= True)
+            print(f"[bench] {name} done")
+    finally:
+        server.stop()
+
+    if tracer.enabled:
+        results["tracing"]= tracer.snapshot()
+    with open(args.out, "w", encoding= "utf-8") as f:
+        json.dump(results, f, indent= 2)
+    print(f"[bench] results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding= "utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
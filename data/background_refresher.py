@@ -0,0 +1,56 @@
+import os
+import threading
+from typing import Optional
+
+from data.data_fetcher import DataFetcher
+
+REFRESH_INTERVAL= float(os.getenv("REFRESH_INTERVAL", "3600"))
+REFRESH_TOP_N= int(os.getenv("REFRESH_TOP_N", "200"))
+REFRESH_AHEAD_DAYS= float(os.getenv("REFRESH_AHEAD_DAYS", "30"))
+
+class BackgroundRefresher:
+
+    def __init__(
+        self,
+        fetcher: DataFetcher,
+        interval: float= REFRESH_INTERVAL,
+        top_n: int= REFRESH_TOP_N,
+        max_age_days: float= REFRESH_AHEAD_DAYS,
+    ):
+        self.fetcher= fetcher
+        self.interval= interval
+        self.top_n= top_n
+        self.max_age_days= max_age_days
+        self.stop_event= threading.Event()
+        self.thread: Optional[threading.Thread]= None
+        self.runs= 0
+        self.errors= 0
+
+    def refresh_once(self) -> int:
+        qids= self.fetcher.hot_qids(self.top_n)
+        if not qids:
+            return 0
+        entities= self.fetcher.get_or_fetch_wikidata_entities_by_qids(qids, load_facts= False, max_age_days= self.max_age_days, track= False)
+        self.runs += 1
+        return len(entities)
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.refresh_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"[refresher] ERROR: {e}")
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread= threading.Thread(target= self.run, name= "entity-refresher", daemon= True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread= None
@@ -1,23 +1,35 @@
-import json
+from collections import Counter
 import os
+import threading
 import time
-from typing import Any, Dict, List
-import requests
+from typing import Any, Dict, List, Optional
 
+from data.entity_parser import collect_label_ids, parse_entity
+from data.wikidata_client import WikidataClient
 from objects.entity import Entity
-from objects.fact import Fact
+from services.label_cache import LabelCache
 from services.qdrant_wrapper import QdrantWrapper
+from services.single_flight import SingleFlight
 from services.sqlite_wrapper import SqliteWrapper
 from services.embedder import Embedder
+from services.tracing import tracer
 
-WIKIDATA_API= os.getenv("WIKIDATA_API")
+ENTITY_MAX_AGE_DAYS= float(os.getenv("ENTITY_MAX_AGE_DAYS", "365"))
+HOT_TRACK_SIZE= int(os.getenv("HOT_TRACK_SIZE", "10000"))
 
 class DataFetcher:
 
-    def __init__(self, sqlite : SqliteWrapper, qdrant : QdrantWrapper, embedder : Embedder):
+    def __init__(self, sqlite : SqliteWrapper, qdrant : QdrantWrapper, embedder : Embedder, client : Optional[WikidataClient]= None):
         self.sqlite= sqlite
         self.qdrant= qdrant
         self.embedder= embedder
+        self.client= client or WikidataClient()
+        self.labels= LabelCache(sqlite)
+        self.label_flight= SingleFlight()
+        self.entity_flight= SingleFlight()
+        self.lock= threading.Lock()
+        self.access_counts: Counter= Counter()
+        self.refresh_stats: Counter= Counter()
 
     def fetch_property_labels(self, ids: List[str]) -> Dict[str, str]:
         labels: Dict[str, str] = {}
@@ -27,143 +39,119 @@ class DataFetcher:
         seen = set()
         uniq_ids = [i for i in ids if i and not (i in seen or seen.add(i))]
 
-        CHUNK = 50
-        for i in range(0, len(uniq_ids), CHUNK):
-            batch = uniq_ids[i:i + CHUNK]
-            params = {
-                "action": "wbgetentities",
-                "ids": "|".join(batch),
-                "languages": "en",
-                "props": "labels",
-                "format": "json",
-            }
-            resp= requests.get(WIKIDATA_API, params=params)
-            entities = resp.json().get("entities", {})
-
-            for wid in batch:
-                ent = entities.get(wid, {}) or {}
-                labels[wid] = ent.get("labels", {}).get("en", {}).get("value", wid)
+        cached, missing = self.labels.get_many(uniq_ids)
+        labels.update(cached)
+        tracer.count("labels.cache_hits", len(cached))
+        tracer.count("labels.misses", len(missing))
 
+        labels.update(self.label_flight.do_many(missing, self.fetch_and_store_labels))
+        return labels
+
+    def fetch_and_store_labels(self, ids: List[str]) -> Dict[str, str]:
+        labels: Dict[str, str] = {}
+        fetched: Dict[str, str] = {}
+        entities = self.client.get_entities(ids, props="labels")
+        for wid in ids:
+            ent = entities.get(wid, {}) or {}
+            labels[wid] = ent.get("labels", {}).get("en", {}).get("value", wid)
+            if wid in entities:
+                fetched[wid] = labels[wid]
+
+        self.labels.put_many(fetched)
         return labels
 
     def fetch_wikidata_entities_by_qids(self, qids: List[str]) -> List[Entity]:
         if not qids:
             return []
 
-        params = {
-            "action": "wbgetentities",
-            "ids": "|".join(qids),
-            "languages": "en",
-            "props": "labels|descriptions|aliases|sitelinks|claims",
-            "format": "json",
-        }
-        resp = requests.get(WIKIDATA_API, params=params)
-        data = resp.json()
-        entities_json: Dict[str, Any] = data.get("entities", {})
-
-        pid_set = set()
-        value_qids = set()
-        for e in entities_json.values():
-            for pid, stmts in e.get("claims", {}).items():
-                pid_set.add(pid)
-                for st in stmts:
-                    dv = (st.get("mainsnak", {}).get("datavalue") or {})
-                    if dv.get("type") == "wikibase-entityid":
-                        v = dv.get("value", {})
-                        q = v.get("id")
-                        if q:
-                            value_qids.add(q)
-
-        pid_labels = self.fetch_property_labels(list(pid_set)) if pid_set else {}
-        value_labels = self.fetch_property_labels(list(value_qids)) if value_qids else {}
-        results: List[Entity] = []
+        with tracer.span("fetcher.fetch_entities"):
+            entities_json: Dict[str, Any] = self.client.get_entities(qids, props="info|labels|descriptions|aliases|sitelinks|claims")
+
+        pid_set, value_qids = collect_label_ids(entities_json.values())
+        labels = self.fetch_property_labels(sorted(pid_set) + sorted(value_qids))
         now_ts = time.time()
 
-        for qid, e in entities_json.items():
-            label = e.get("labels", {}).get("en", {}).get("value", "")
-            desc = e.get("descriptions", {}).get("en", {}).get("value", "")
-            aliases = [a.get("value", "") for a in e.get("aliases", {}).get("en", [])]
-            sitelinks = {k: v.get("title", "") for k, v in e.get("sitelinks", {}).items()}
-
-            facts: List[Fact] = []
-            for pid, statements in e.get("claims", {}).items():
-                prop_label = pid_labels.get(pid, pid)
-                for st in statements:
-                    guid = st.get("id") or f"{qid}${pid}${hash((pid, json.dumps(st, ensure_ascii=False, sort_keys=True), st.get('rank')))}"
-                    mainsnak = st.get("mainsnak", {})
-                    datavalue = mainsnak.get("datavalue", {})
-                    value_type = datavalue.get("type", "")
-
-                    value_qid = None
-                    value_literal = None
-                    val = datavalue.get("value")
-                    if value_type == "wikibase-entityid" and isinstance(val, dict):
-                        value_qid = val.get("id")
-                    elif val is not None:
-                        value_literal = json.dumps(val, ensure_ascii=False) if isinstance(val, (dict, list)) else str(val)
-
-                    facts.append(
-                        Fact(
-                            guid=guid,
-                            pid=pid,
-                            subject_qid=qid,
-                            property_label=prop_label,
-                            value_type=value_type,
-                            value_qid=value_qid,
-                            value_label=value_labels.get(value_qid) if value_qid else None,
-                            value_literal=value_literal,
-                            rank=st.get("rank"),
-                            qualifiers=st.get("qualifiers"),
-                            references=st.get("references"),
-                            fetched_at=now_ts,
-                        )
-                    )
-
-            results.append(
-                Entity(
-                    qid=qid,
-                    label=label,
-                    description=desc,
-                    aliases=aliases,
-                    sitelinks=sitelinks,
-                    facts=facts,
-                    fetched_at=now_ts,
-                )
-            )
-
-        return results
-
-
-    def get_or_fetch_wikidata_entities_by_qids(self, qids: list):
+        return [parse_entity(qid, e, labels, now_ts) for qid, e in entities_json.items()]
+
+
+    def get_or_fetch_wikidata_entities_by_qids(self, qids: list, load_facts: bool= True, max_age_days: float= ENTITY_MAX_AGE_DAYS, track: bool= True):
         entities: List[Entity]= []
         missing_qids: List[str]= []
-
+        if track:
+            self.record_access(qids)
+
+        summaries= self.sqlite.get_entity_summaries(qids)
+        stale_qids= [q for q in qids if q in summaries and Entity.age_is_stale(summaries[q]["fetched_at"], max_age_days)]
+        revalidated= self.revalidate_entities(stale_qids, summaries) if stale_qids else []
+        fresh_qids= [q for q in qids if q in summaries and (q in revalidated or q not in stale_qids)]
+        cached= {e.qid: e for e in self.sqlite.get_entities(fresh_qids, load_facts= load_facts)}
         for qid in qids:
-            entity= self.sqlite.get_entity(qid)
-            if entity and (not entity.is_stale()):
+            entity= cached.get(qid)
+            if entity:
                 entities.append(entity)
             else:
                 missing_qids.append(qid)
 
+        tracer.count("entities.cache_hits", len(entities))
         if missing_qids:
-            fetched_entities= self.fetch_wikidata_entities_by_qids(missing_qids)
-            for fe in fetched_entities:
-                self.sqlite.upsert_entity(fe)
-                self.qdrant.upsert_entity(fe)
-                entities.append(fe)
+            tracer.count("entities.fetched", len(missing_qids))
+            fetched= self.entity_flight.do_many(missing_qids, self.fetch_and_store_entities)
+            entities.extend(e for e in fetched.values() if e is not None)
 
         return entities
-        
-    def search_for_qid(self, entity: str, limit= 3):
-        url= WIKIDATA_API
-        params= {
-            "action": "wbsearchentities",
-            "search": entity,
-            "language": "en",
-            "format": "json",
-            "limit": limit
+
+    def revalidate_entities(self, qids: List[str], summaries: Dict[str, Dict[str, Any]]) -> List[str]:
+        with tracer.span("fetcher.revalidate"):
+            info = self.client.get_entities(qids, props="info")
+        unchanged = [
+            q for q in qids
+            if summaries[q].get("lastrevid") is not None
+            and (info.get(q) or {}).get("lastrevid") == summaries[q]["lastrevid"]
+        ]
+        self.sqlite.touch_entities(unchanged, fetched_at= time.time())
+        with self.lock:
+            self.refresh_stats["revalidated"] += len(unchanged)
+            self.refresh_stats["changed"] += len(qids) - len(unchanged)
+        return unchanged
+
+    def fetch_and_store_entities(self, qids: List[str]) -> Dict[str, Entity]:
+        previous= self.sqlite.get_entity_summaries(qids)
+        fetched_entities= self.fetch_wikidata_entities_by_qids(qids)
+        write_stats= self.sqlite.refresh_entities(fetched_entities)
+        to_embed= [e for e in fetched_entities if (previous.get(e.qid) or {}).get("vector_hash") != e.vector_hash()]
+        self.qdrant.upsert_entities(to_embed)
+        with self.lock:
+            for k, v in write_stats.items():
+                self.refresh_stats[k] += v
+            self.refresh_stats["embedded"] += len(to_embed)
+            self.refresh_stats["embed_skipped"] += len(fetched_entities) - len(to_embed)
+        return {e.qid: e for e in fetched_entities}
+
+    def record_access(self, qids: List[str]) -> None:
+        with self.lock:
+            self.access_counts.update(q for q in qids if q)
+            if len(self.access_counts) > HOT_TRACK_SIZE:
+                self.access_counts= Counter(dict(self.access_counts.most_common(HOT_TRACK_SIZE // 2)))
+
+    def hot_qids(self, limit: int) -> List[str]:
+        with self.lock:
+            return [q for q, _count in self.access_counts.most_common(limit)]
+
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "entities": self.entity_flight.stats(),
+            "labels": self.label_flight.stats(),
         }
 
-        response= requests.get(url, params= params)
-        data= response.json()
-        return [result["id"] for result in data.get("search", [])]
\ No newline at end of file
+    def refresh_counters(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.refresh_stats)
+        
+    def resolve_local(self, query: str, limit: int= 3) -> List[str]:
+        qids= self.sqlite.search_entity_names(query, limit= limit)
+        tracer.count("resolve.local_hits" if qids else "resolve.local_misses")
+        return qids
+
+    def search_for_qid(self, entity: str, limit= 3):
+        with tracer.span("fetcher.search"):
+            return [result["id"] for result in self.client.search(entity, limit= limit)]
\ No newline at end of file
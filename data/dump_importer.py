@@ -0,0 +1,205 @@
+import bz2
+from concurrent.futures import Future, ProcessPoolExecutor
+import gzip
+import json
+import os
+import time
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from data.data_fetcher import DataFetcher
+from data.entity_parser import apply_labels, collect_label_ids, parse_entity
+from objects.entity import Entity
+
+IMPORT_BATCH_SIZE= int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_WORKERS= int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_REPORT_EVERY= float(os.getenv("IMPORT_REPORT_EVERY", "10"))
+BACKFILL_BATCH_SIZE= int(os.getenv("BACKFILL_BATCH_SIZE", "200"))
+
+
+def open_dump(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding= "utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding= "utf-8")
+    return open(path, "r", encoding= "utf-8")
+
+
+def parse_dump_lines(lines: List[str], fetched_at: float) -> Tuple[List[Tuple[Entity, List[str]]], Dict[str, str]]:
+    parsed= []
+    labels: Dict[str, str]= {}
+    for line in lines:
+        line= line.strip().rstrip(",")
+        if not line or line in ("[", "]"):
+            continue
+        e= json.loads(line)
+        wid= e.get("id")
+        if not wid:
+            continue
+        label= e.get("labels", {}).get("en", {}).get("value")
+        if label:
+            labels[wid]= label
+        if e.get("type", "item") != "item":
+            continue
+        pid_set, value_qids= collect_label_ids([e])
+        parsed.append((parse_entity(wid, e, None, fetched_at), sorted(pid_set | value_qids)))
+    return parsed, labels
+
+
+class DumpImporter:
+
+    def __init__(
+        self,
+        fetcher: DataFetcher,
+        batch_size: int= IMPORT_BATCH_SIZE,
+        workers: int= IMPORT_WORKERS,
+        fetch_missing_labels: bool= True,
+        checkpoint_path: Optional[str]= None,
+    ):
+        self.fetcher= fetcher
+        self.sqlite= fetcher.sqlite
+        self.qdrant= fetcher.qdrant
+        self.batch_size= batch_size
+        self.workers= max(1, workers)
+        self.fetch_missing_labels= fetch_missing_labels
+        self.checkpoint_path= checkpoint_path
+        self.entities= 0
+        self.facts= 0
+        self.resumed_entities= 0
+        self.resumed_facts= 0
+        self.started_at= 0.0
+        self.last_report= 0.0
+
+    def checkpoint_file(self, source: str) -> str:
+        return self.checkpoint_path or f"{source}.checkpoint.json"
+
+    def load_checkpoint(self, source: str) -> Dict[str, Any]:
+        path= self.checkpoint_file(source)
+        if not os.path.exists(path):
+            return {"line": 0, "entities": 0, "facts": 0}
+        with open(path, "r", encoding= "utf-8") as f:
+            return json.load(f)
+
+    def save_checkpoint(self, source: str, line: int) -> None:
+        path= self.checkpoint_file(source)
+        tmp= path + ".tmp"
+        with open(tmp, "w", encoding= "utf-8") as f:
+            json.dump({"source": source, "line": line, "entities": self.entities, "facts": self.facts, "saved_at": time.time()}, f)
+        os.replace(tmp, path)
+
+    def start(self, source: str) -> Dict[str, Any]:
+        checkpoint= self.load_checkpoint(source)
+        self.entities= self.resumed_entities= checkpoint.get("entities", 0)
+        self.facts= self.resumed_facts= checkpoint.get("facts", 0)
+        self.started_at= self.last_report= time.time()
+        return checkpoint
+
+    def read_batches(self, f: IO[str], start_line: int) -> Iterator[Tuple[int, List[str]]]:
+        batch: List[str]= []
+        line_no= 0
+        for line in f:
+            line_no += 1
+            if line_no <= start_line:
+                continue
+            batch.append(line)
+            if len(batch) >= self.batch_size:
+                yield line_no, batch
+                batch= []
+        if batch:
+            yield line_no, batch
+
+    def resolve_labels(self, parsed: List[Tuple[Entity, List[str]]]) -> Dict[str, str]:
+        # Labels for entities further down the dump are filled in by backfill_labels, not fetched per batch.
+        labels, _missing= self.fetcher.labels.get_many(sorted({i for _, ids in parsed for i in ids}))
+        return labels
+
+    def write_batch(self, parsed: List[Tuple[Entity, List[str]]], seeded: Dict[str, str]) -> None:
+        self.fetcher.labels.put_many(seeded)
+        if not parsed:
+            return
+        labels= self.resolve_labels(parsed)
+        entities= [e for e, _ in parsed]
+        for e in entities:
+            apply_labels(e, labels)
+        self.sqlite.upsert_entities(entities)
+        self.qdrant.upsert_entities(entities, wait= False)
+        self.entities += len(entities)
+        self.facts += sum(len(e.facts) for e in entities)
+
+    def report(self, force: bool= False) -> None:
+        now= time.time()
+        if not force and now - self.last_report < IMPORT_REPORT_EVERY:
+            return
+        self.last_report= now
+        elapsed= max(now - self.started_at, 1e-9)
+        entity_rate= (self.entities - self.resumed_entities) / elapsed
+        fact_rate= (self.facts - self.resumed_facts) / elapsed
+        print(f"[import] {self.entities} entities, {self.facts} facts, {entity_rate:.1f} entities/s, {fact_rate:.1f} facts/s")
+
+    def import_dump(self, path: str) -> int:
+        checkpoint= self.start(path)
+
+        with open_dump(path) as f, ProcessPoolExecutor(max_workers= self.workers) as pool:
+            pending: Optional[Tuple[int, List[Future]]]= None
+            for line_no, lines in self.read_batches(f, checkpoint.get("line", 0)):
+                step= max(1, len(lines) // self.workers)
+                now_ts= time.time()
+                futures= [pool.submit(parse_dump_lines, lines[i:i + step], now_ts) for i in range(0, len(lines), step)]
+                if pending:
+                    self.finish_batch(path, *pending)
+                pending= (line_no, futures)
+            if pending:
+                self.finish_batch(path, *pending)
+
+        self.report(force= True)
+        self.backfill_labels()
+        return self.entities - self.resumed_entities
+
+    def finish_batch(self, path: str, line_no: int, futures: List[Future]) -> None:
+        parsed: List[Tuple[Entity, List[str]]]= []
+        seeded: Dict[str, str]= {}
+        for fut in futures:
+            batch, labels= fut.result()
+            parsed += batch
+            seeded.update(labels)
+        self.write_batch(parsed, seeded)
+        self.save_checkpoint(path, line_no)
+        self.report()
+
+    def backfill_labels(self, batch_size: int= BACKFILL_BATCH_SIZE) -> int:
+        updated= 0
+        after= ""
+        while True:
+            qids= self.sqlite.subjects_with_unlabeled_facts(after, batch_size)
+            if not qids:
+                break
+            after= qids[-1]
+            entities= self.sqlite.get_entities(qids)
+            ids= sorted({f.pid for e in entities for f in e.facts} | {f.value_qid for e in entities for f in e.facts if f.value_qid})
+            if self.fetch_missing_labels:
+                labels= self.fetcher.fetch_property_labels(ids)
+            else:
+                labels, _missing= self.fetcher.labels.get_many(ids)
+            hashes= self.sqlite.get_entity_summaries(qids)
+            for e in entities:
+                apply_labels(e, labels)
+            self.sqlite.refresh_entities(entities)
+            changed= [e for e in entities if e.vector_hash() != (hashes.get(e.qid) or {}).get("vector_hash")]
+            self.qdrant.upsert_entities(changed, wait= False)
+            updated += len(entities)
+        print(f"[import] backfilled labels for {updated} entities")
+        return updated
+
+    def import_qid_list(self, path: str) -> int:
+        checkpoint= self.start(path)
+
+        with open(path, "r", encoding= "utf-8") as f:
+            for line_no, lines in self.read_batches(f, checkpoint.get("line", 0)):
+                qids= [q.strip() for q in lines if q.strip()]
+                entities= self.fetcher.get_or_fetch_wikidata_entities_by_qids(qids)
+                self.entities += len(entities)
+                self.facts += sum(len(e.facts) for e in entities)
+                self.save_checkpoint(path, line_no)
+                self.report()
+
+        self.report(force= True)
+        return self.entities - self.resumed_entities
@@ -0,0 +1,82 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from objects.entity import Entity
+from objects.fact import Fact
+
+
+def collect_label_ids(entities_json: Iterable[Dict[str, Any]]) -> Tuple[Set[str], Set[str]]:
+    pid_set = set()
+    value_qids = set()
+    for e in entities_json:
+        for pid, stmts in e.get("claims", {}).items():
+            pid_set.add(pid)
+            for st in stmts:
+                dv = (st.get("mainsnak", {}).get("datavalue") or {})
+                if dv.get("type") == "wikibase-entityid":
+                    v = dv.get("value", {})
+                    q = v.get("id")
+                    if q:
+                        value_qids.add(q)
+    return pid_set, value_qids
+
+
+def parse_entity(qid: str, e: Dict[str, Any], labels: Optional[Dict[str, str]], fetched_at: float) -> Entity:
+    labels = labels or {}
+    label = e.get("labels", {}).get("en", {}).get("value", "")
+    desc = e.get("descriptions", {}).get("en", {}).get("value", "")
+    aliases = [a.get("value", "") for a in e.get("aliases", {}).get("en", [])]
+    sitelinks = {k: v.get("title", "") for k, v in e.get("sitelinks", {}).items()}
+
+    facts: List[Fact] = []
+    for pid, statements in e.get("claims", {}).items():
+        prop_label = labels.get(pid, pid)
+        for st in statements:
+            guid = st.get("id") or f"{qid}${pid}${hash((pid, json.dumps(st, ensure_ascii=False, sort_keys=True), st.get('rank')))}"
+            mainsnak = st.get("mainsnak", {})
+            datavalue = mainsnak.get("datavalue", {})
+            value_type = datavalue.get("type", "")
+
+            value_qid = None
+            value_literal = None
+            val = datavalue.get("value")
+            if value_type == "wikibase-entityid" and isinstance(val, dict):
+                value_qid = val.get("id")
+            elif val is not None:
+                value_literal = json.dumps(val, ensure_ascii=False) if isinstance(val, (dict, list)) else str(val)
+
+            facts.append(
+                Fact(
+                    guid=guid,
+                    pid=pid,
+                    subject_qid=qid,
+                    property_label=prop_label,
+                    value_type=value_type,
+                    value_qid=value_qid,
+                    value_label=labels.get(value_qid) if value_qid else None,
+                    value_literal=value_literal,
+                    rank=st.get("rank"),
+                    qualifiers=st.get("qualifiers"),
+                    references=st.get("references"),
+                    fetched_at=fetched_at,
+                )
+            )
+
+    return Entity(
+        qid=qid,
+        label=label,
+        description=desc,
+        aliases=aliases,
+        sitelinks=sitelinks,
+        facts=facts,
+        fetched_at=fetched_at,
+        lastrevid=e.get("lastrevid"),
+        modified=e.get("modified"),
+    )
+
+
+def apply_labels(entity: Entity, labels: Dict[str, str]) -> None:
+    for f in entity.facts:
+        f.property_label = labels.get(f.pid, f.pid)
+        f.value_label = labels.get(f.value_qid) if f.value_qid else None
+        f.finalize_display()
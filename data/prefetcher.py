@@ -0,0 +1,198 @@
+from collections import Counter
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from data.data_fetcher import DataFetcher
+from objects.entity import Entity
+
+PREFETCH_QUEUE_SIZE= int(os.getenv("PREFETCH_QUEUE_SIZE", "1000"))
+PREFETCH_WORKERS= int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_BATCH_SIZE= int(os.getenv("PREFETCH_BATCH_SIZE", "20"))
+PREFETCH_PER_ENTITY= int(os.getenv("PREFETCH_PER_ENTITY", "10"))
+PREFETCH_DAILY_BUDGET= int(os.getenv("PREFETCH_DAILY_BUDGET", "5000"))
+
+PROPERTY_WEIGHTS: Dict[str, float]= {
+    "P26": 5.0,    # spouse
+    "P22": 4.0,    # father
+    "P25": 4.0,    # mother
+    "P40": 4.0,    # child
+    "P3373": 3.5,  # sibling
+    "P19": 4.0,    # place of birth
+    "P20": 3.5,    # place of death
+    "P108": 4.0,   # employer
+    "P69": 3.5,    # educated at
+    "P463": 2.5,   # member of
+    "P102": 3.0,   # political party
+    "P39": 3.0,    # position held
+    "P166": 2.0,   # award received
+    "P50": 4.0,    # author
+    "P57": 4.0,    # director
+    "P161": 2.5,   # cast member
+    "P175": 3.5,   # performer
+    "P36": 4.0,    # capital
+    "P35": 3.5,    # head of state
+    "P6": 3.5,     # head of government
+    "P159": 3.0,   # headquarters location
+    "P112": 3.5,   # founded by
+    "P17": 1.5,    # country
+    "P131": 1.5,   # located in the administrative territorial entity
+    "P27": 1.0,    # country of citizenship
+    "P31": 0.0,    # instance of
+    "P279": 0.0,   # subclass of
+}
+DEFAULT_PROPERTY_WEIGHT= 1.0
+RANK_WEIGHTS= {"preferred": 1.5, "normal": 1.0, "deprecated": 0.0}
+
+def rank_linked_qids(entity: Entity, limit: int= PREFETCH_PER_ENTITY) -> List[Tuple[str, float]]:
+    scores: Dict[str, float]= {}
+    for f in entity.facts:
+        if not f.value_qid or f.value_qid == entity.qid:
+            continue
+        score= PROPERTY_WEIGHTS.get(f.pid, DEFAULT_PROPERTY_WEIGHT) * RANK_WEIGHTS.get((f.rank or "normal").lower(), 1.0)
+        if score > 0:
+            scores[f.value_qid]= max(score, scores.get(f.value_qid, 0.0))
+    return sorted(scores.items(), key= lambda kv: -kv[1])[:limit]
+
+class LinkedEntityPrefetcher:
+
+    def __init__(
+        self,
+        fetcher: DataFetcher,
+        queue_size: int= PREFETCH_QUEUE_SIZE,
+        workers: int= PREFETCH_WORKERS,
+        batch_size: int= PREFETCH_BATCH_SIZE,
+        per_entity: int= PREFETCH_PER_ENTITY,
+        daily_budget: int= PREFETCH_DAILY_BUDGET,
+    ):
+        self.fetcher= fetcher
+        self.sqlite= fetcher.sqlite
+        self.workers= max(1, workers)
+        self.batch_size= max(1, batch_size)
+        self.per_entity= per_entity
+        self.daily_budget= daily_budget
+        self.intake: "queue.Queue[Entity]"= queue.Queue(maxsize= queue_size)
+        self.pending: "queue.PriorityQueue[Tuple[float, int, str]]"= queue.PriorityQueue(maxsize= queue_size)
+        self.sequence= itertools.count()
+        self.lock= threading.Lock()
+        self.queued: set= set()
+        self.budget_day= time.strftime("%Y-%m-%d")
+        self.budget_used= 0
+        self.counters: Counter= Counter()
+        self.stop_event= threading.Event()
+        self.threads: List[threading.Thread]= []
+
+    def observe(self, entities: List[Entity]) -> None:
+        for e in entities:
+            try:
+                self.intake.put_nowait(e)
+            except queue.Full:
+                with self.lock:
+                    self.counters["intake_dropped"] += 1
+
+    def plan(self, entity: Entity) -> None:
+        candidates= rank_linked_qids(entity, self.per_entity)
+        with self.lock:
+            candidates= [(qid, score) for qid, score in candidates if qid not in self.queued]
+        if not candidates:
+            return
+        known= self.sqlite.get_entity_summaries([qid for qid, _score in candidates])
+        for qid, score in candidates:
+            if qid in known:
+                with self.lock:
+                    self.counters["already_cached"] += 1
+                continue
+            try:
+                self.pending.put_nowait((-score, next(self.sequence), qid))
+            except queue.Full:
+                with self.lock:
+                    self.counters["dropped"] += 1
+                continue
+            with self.lock:
+                self.queued.add(qid)
+                self.counters["queued"] += 1
+
+    def take_budget(self, wanted: int) -> int:
+        with self.lock:
+            today= time.strftime("%Y-%m-%d")
+            if today != self.budget_day:
+                self.budget_day= today
+                self.budget_used= 0
+            granted= max(0, min(wanted, self.daily_budget - self.budget_used))
+            self.budget_used += granted
+            if granted < wanted:
+                self.counters["over_budget"] += wanted - granted
+            return granted
+
+    def next_batch(self) -> List[str]:
+        try:
+            _score, _seq, qid= self.pending.get(timeout= 0.5)
+        except queue.Empty:
+            return []
+        batch= [qid]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.pending.get_nowait()[2])
+            except queue.Empty:
+                break
+        return batch
+
+    def fetch_batch(self, batch: List[str]) -> int:
+        granted= self.take_budget(len(batch))
+        try:
+            if not granted:
+                return 0
+            entities= self.fetcher.get_or_fetch_wikidata_entities_by_qids(batch[:granted], load_facts= False, track= False)
+            with self.lock:
+                self.counters["fetched"] += len(entities)
+            return len(entities)
+        finally:
+            with self.lock:
+                self.queued.difference_update(batch)
+
+    def plan_loop(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                entity= self.intake.get(timeout= 0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.plan(entity)
+            except Exception as e:
+                with self.lock:
+                    self.counters["errors"] += 1
+                print(f"[prefetch] ERROR: {e}")
+
+    def fetch_loop(self) -> None:
+        while not self.stop_event.is_set():
+            batch= self.next_batch()
+            if not batch:
+                continue
+            try:
+                self.fetch_batch(batch)
+            except Exception as e:
+                with self.lock:
+                    self.counters["errors"] += 1
+                print(f"[prefetch] ERROR: {e}")
+
+    def start(self) -> None:
+        if self.threads:
+            return
+        self.stop_event.clear()
+        self.threads= [threading.Thread(target= self.plan_loop, name= "prefetch-planner", daemon= True)]
+        self.threads += [threading.Thread(target= self.fetch_loop, name= f"prefetch-{i}", daemon= True) for i in range(self.workers)]
+        for t in self.threads:
+            t.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        for t in self.threads:
+            t.join()
+        self.threads= []
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters, pending= self.pending.qsize(), budget_used= self.budget_used, budget= self.daily_budget)
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.tracing import tracer
+
+WIKIDATA_API= os.getenv("WIKIDATA_API")
+WIKIDATA_USER_AGENT= os.getenv("WIKIDATA_USER_AGENT", "Wikidata-Assistant/1.0 (https://github.com/Armad999/Wikidata-Assistant)")
+WIKIDATA_MAX_WORKERS= int(os.getenv("WIKIDATA_MAX_WORKERS", "4"))
+WIKIDATA_MAXLAG= int(os.getenv("WIKIDATA_MAXLAG", "5"))
+WIKIDATA_MAX_RETRIES= int(os.getenv("WIKIDATA_MAX_RETRIES", "5"))
+WIKIDATA_TIMEOUT= float(os.getenv("WIKIDATA_TIMEOUT", "30"))
+WIKIDATA_IDS_PER_REQUEST= 50
+RETRY_STATUS= (429, 500, 502, 503, 504)
+
+class WikidataError(Exception):
+    pass
+
+class WikidataClient:
+
+    def __init__(
+        self,
+        api_url: str= WIKIDATA_API,
+        max_workers: int= WIKIDATA_MAX_WORKERS,
+        maxlag: Optional[int]= WIKIDATA_MAXLAG,
+        max_retries: int= WIKIDATA_MAX_RETRIES,
+        timeout: float= WIKIDATA_TIMEOUT,
+        backoff: float= 1.0,
+    ):
+        self.api_url= api_url
+        self.max_workers= max(1, max_workers)
+        self.maxlag= maxlag
+        self.max_retries= max_retries
+        self.timeout= timeout
+        self.backoff= backoff
+        self.session= requests.Session()
+        self.session.headers.update({"User-Agent": WIKIDATA_USER_AGENT, "Accept-Encoding": "gzip"})
+        adapter= HTTPAdapter(pool_connections= self.max_workers, pool_maxsize= self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool= ThreadPoolExecutor(max_workers= self.max_workers, thread_name_prefix= "wikidata")
+        self.lock= threading.Lock()
+        self.requests_sent= 0
+        self.retries= 0
+
+    def retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        params= dict(params)
+        params.setdefault("format", "json")
+        if self.maxlag is not None:
+            params.setdefault("maxlag", self.maxlag)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after= None
+            try:
+                with self.lock:
+                    self.requests_sent += 1
+                tracer.count("http.requests")
+                with tracer.span("http.request"):
+                    resp= self.session.get(self.api_url, params= params, timeout= self.timeout)
+                tracer.count("http.bytes", len(resp.content))
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    data= resp.json()
+                    error= data.get("error") or {}
+                    if error.get("code") != "maxlag":
+                        return data
+                retry_after= resp.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+
+            if attempt >= self.max_retries:
+                break
+            with self.lock:
+                self.retries += 1
+            tracer.count("http.retries")
+            time.sleep(self.retry_delay(attempt, retry_after))
+
+        raise WikidataError(f"Wikidata API gave up after {self.max_retries} retries: {params.get('action')}")
+
+    def get_entities(self, ids: List[str], props: str, languages: str= "en") -> Dict[str, Any]:
+        seen= set()
+        uniq_ids= [i for i in ids if i and not (i in seen or seen.add(i))]
+        if not uniq_ids:
+            return {}
+
+        batches= [uniq_ids[i:i + WIKIDATA_IDS_PER_REQUEST] for i in range(0, len(uniq_ids), WIKIDATA_IDS_PER_REQUEST)]
+        params= [
+            {"action": "wbgetentities", "ids": "|".join(b), "languages": languages, "props": props}
+            for b in batches
+        ]
+        if len(params) == 1:
+            responses= [self.get(params[0])]
+        else:
+            futures= [self.pool.submit(contextvars.copy_context().run, self.get, p) for p in params]
+            responses= [f.result() for f in futures]
+
+        entities: Dict[str, Any]= {}
+        for data in responses:
+            entities.update(data.get("entities", {}))
+        return entities
+
+    def search(self, search: str, limit: int= 3, language: str= "en") -> List[Dict[str, Any]]:
+        data= self.get({
+            "action": "wbsearchentities",
+            "search": search,
+            "language": language,
+            "limit": limit,
+        })
+        return data.get("search", [])
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"requests": self.requests_sent, "retries": self.retries}
+
+    def close(self) -> None:
+        self.pool.shutdown(wait= False)
+        self.session.close()
@@ -0,0 +1,46 @@
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+from data.data_fetcher import DataFetcher
+from data.dump_importer import IMPORT_BATCH_SIZE, IMPORT_WORKERS, DumpImporter
+from services.embedder import Embedder
+from services.qdrant_wrapper import QdrantWrapper
+from services.sqlite_wrapper import SqliteWrapper
+
+
+def main():
+    parser= argparse.ArgumentParser(description= "Bulk-seed the SQLite cache and Qdrant collection.")
+    parser.add_argument("mode", choices= ["dump", "qids"], help= "'dump' for a Wikidata JSON dump, 'qids' for a file with one QID per line")
+    parser.add_argument("path", help= "latest-all.json(.gz/.bz2) or QID list file")
+    parser.add_argument("--batch-size", type= int, default= IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type= int, default= IMPORT_WORKERS)
+    parser.add_argument("--checkpoint", default= None, help= "checkpoint file (default: <path>.checkpoint.json)")
+    parser.add_argument("--no-label-fetch", action= "store_true", help= "only use labels already cached or present in the dump")
+    args= parser.parse_args()
+
+    sqlite= SqliteWrapper()
+    embedder= Embedder(sqlite= sqlite)
+    qdrant= QdrantWrapper(embedder= embedder, sqlite= sqlite)
+    fetcher= DataFetcher(sqlite= sqlite, qdrant= qdrant, embedder= embedder)
+    importer= DumpImporter(
+        fetcher,
+        batch_size= args.batch_size,
+        workers= args.workers,
+        fetch_missing_labels= not args.no_label_fetch,
+        checkpoint_path= args.checkpoint,
+    )
+
+    try:
+        if args.mode == "dump":
+            count= importer.import_dump(args.path)
+        else:
+            count= importer.import_qid_list(args.path)
+    finally:
+        qdrant.close()
+        sqlite.flush_access_times()
+    print(f"Imported {count} entities.")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,156 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from llm.llama_model import LlamaModel
+from objects.entity import Entity
+
+BATCH_WINDOW= int(os.getenv("BATCH_WINDOW", "64"))
+BATCH_RETRIEVAL_WORKERS= int(os.getenv("BATCH_RETRIEVAL_WORKERS", "8"))
+
+def read_queries(path: str, query_field: str= "query", id_field: str= "id") -> Iterator[Tuple[str, str]]:
+    with open(path, "r", encoding= "utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line= line.strip()
+            if not line:
+                continue
+            record= json.loads(line)
+            query= str(record.get(query_field) or "").strip()
+            if query:
+                record_id= record.get(id_field)
+                yield str(line_no if record_id is None or record_id == "" else record_id), query
+
+def completed_ids(path: str) -> Set[str]:
+    done: Set[str]= set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding= "utf-8") as f:
+        for line in f:
+            try:
+                record= json.loads(line)
+            except ValueError:
+                continue
+            # Failed records are retried on the next run.
+            if "id" in record and "error" not in record:
+                done.add(str(record["id"]))
+    return done
+
+class BatchRunner:
+
+    def __init__(self, model: LlamaModel, limit: int= 3, min_score: float= 0.80, window: int= BATCH_WINDOW, workers: int= BATCH_RETRIEVAL_WORKERS):
+        self.model= model
+        self.fetcher= model.fetcher
+        self.limit= limit
+        self.min_score= min_score
+        self.window= max(1, window)
+        self.pool= ThreadPoolExecutor(max_workers= max(1, workers), thread_name_prefix= "batch-retrieval")
+        self.prefetch= ThreadPoolExecutor(max_workers= 1, thread_name_prefix= "batch-prefetch")
+        self.answered= 0
+        self.skipped= 0
+        self.failed= 0
+        self.started_at= 0.0
+
+    def resolve(self, query: str) -> Tuple[List[str], bool, float, Optional[str]]:
+        started= time.perf_counter()
+        try:
+            qids, cached= self.model.resolve_qids(query, self.limit, self.min_score)
+        except Exception as e:
+            return [], False, time.perf_counter() - started, str(e)
+        return qids, cached, time.perf_counter() - started, None
+
+    def prepare_window(self, items: List[Tuple[str, str]]) -> List[Tuple[str, str, List[Entity], float, Optional[str]]]:
+        resolved= list(self.pool.map(lambda item: self.resolve(item[1]), items))
+        all_qids= list(dict.fromkeys(q for qids, _cached, _t, _error in resolved for q in qids))
+        started= time.perf_counter()
+        try:
+            by_qid= {e.qid: e for e in self.fetcher.get_or_fetch_wikidata_entities_by_qids(all_qids, load_facts= False)}
+            bulk_error= None
+        except Exception as e:
+            by_qid, bulk_error= {}, str(e)
+        bulk= (time.perf_counter() - started) / max(1, len(items))
+
+        prepared= []
+        for (record_id, query), (qids, cached, elapsed, error) in zip(items, resolved):
+            error= error or (bulk_error if qids else None)
+            entities= [by_qid[q] for q in qids if q in by_qid]
+            if error is None and not entities and qids:
+                # The first resolver's ids did not load; let retrieve() fall through to the later resolvers.
+                started= time.perf_counter()
+                try:
+                    entities= self.model.retrieve(query, self.limit, self.min_score)
+                except Exception as e:
+                    error= str(e)
+                elapsed += time.perf_counter() - started
+            elif entities and not cached:
+                self.model.cache.put_retrieval(query, self.limit, self.min_score, [e.qid for e in entities])
+            prepared.append((record_id, query, entities, elapsed + bulk, error))
+        return prepared
+
+    def windows(self, path: str, done: Set[str], query_field: str, id_field: str) -> Iterator[List[Tuple[str, str]]]:
+        window: List[Tuple[str, str]]= []
+        for record_id, query in read_queries(path, query_field, id_field):
+            if record_id in done:
+                self.skipped += 1
+                continue
+            window.append((record_id, query))
+            if len(window) >= self.window:
+                yield window
+                window= []
+        if window:
+            yield window
+
+    def answer(self, record_id: str, query: str, entities: List[Entity], retrieval: float) -> Dict[str, Any]:
+        stats: Dict[str, Any]= {}
+        answer= "".join(self.model.rag_ask_stream(query, limit= self.limit, min_score= self.min_score, stats= stats, entities= entities))
+        return {
+            "id": record_id,
+            "query": query,
+            "answer": answer,
+            "qids": [e.qid for e in entities],
+            "timings": {"retrieval": retrieval, "ttft": stats.get("ttft"), "generation": stats.get("total")},
+            "tokens": stats.get("tokens"),
+            "cached": stats.get("cached"),
+        }
+
+    def run(self, input_path: str, output_path: str, query_field: str= "query", id_field: str= "id") -> int:
+        done= completed_ids(output_path)
+        self.started_at= time.time()
+        pending: Optional[Future]= None
+
+        with open(output_path, "a", encoding= "utf-8") as out:
+            for items in self.windows(input_path, done, query_field, id_field):
+                future= self.prefetch.submit(self.prepare_window, items)
+                if pending is not None:
+                    self.write_window(out, pending.result())
+                pending= future
+            if pending is not None:
+                self.write_window(out, pending.result())
+
+        self.report()
+        return self.answered
+
+    def write_window(self, out, prepared: List[Tuple[str, str, List[Entity], float, Optional[str]]]) -> None:
+        for record_id, query, entities, retrieval, error in prepared:
+            if error is None:
+                try:
+                    record= self.answer(record_id, query, entities, retrieval)
+                    self.answered += 1
+                except Exception as e:
+                    error= str(e)
+            if error is not None:
+                print(f"[batch] ERROR {record_id}: {error}")
+                record= {"id": record_id, "error": error}
+                self.failed += 1
+            out.write(json.dumps(record, ensure_ascii= False) + "\n")
+            out.flush()
+        self.report()
+
+    def report(self) -> None:
+        elapsed= max(time.time() - self.started_at, 1e-9)
+        print(f"[batch] {self.answered} answered, {self.failed} failed, {self.skipped} already done, {self.answered / elapsed:.2f} queries/s")
+
+    def close(self) -> None:
+        self.prefetch.shutdown(wait= False)
+        self.pool.shutdown(wait= False)
@@ -0,0 +1,111 @@
+import logging
+import math
+import os
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from objects.entity import Entity
+
+RAG_CONTEXT_TOKENS= int(os.getenv("RAG_CONTEXT_TOKENS", "2048"))
+
+STOPWORDS= {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "how", "in", "is", "it", "of", "on", "or", "tell", "that", "the", "to", "was", "were", "what",
+    "when", "where", "which", "who", "whom", "whose", "why", "with", "about", "me",
+}
+
+QUERY_SYNONYMS= {
+    "born": {"birth"},
+    "birthday": {"birth", "date"},
+    "birthplace": {"birth", "place"},
+    "died": {"death"},
+    "die": {"death"},
+    "dead": {"death"},
+    "buried": {"burial"},
+    "wife": {"spouse"},
+    "husband": {"spouse"},
+    "married": {"spouse"},
+    "kids": {"child"},
+    "children": {"child"},
+    "parents": {"father", "mother"},
+    "job": {"occupation", "position"},
+    "work": {"employer", "occupation"},
+    "worked": {"employer"},
+    "studied": {"educated", "academic"},
+    "school": {"educated"},
+    "university": {"educated", "employer"},
+    "awards": {"award"},
+    "won": {"award"},
+    "nationality": {"citizenship"},
+    "country": {"citizenship", "country"},
+    "capital": {"capital"},
+    "population": {"population"},
+    "founded": {"inception", "founded"},
+    "located": {"location", "located"},
+}
+
+logger= logging.getLogger(__name__)
+
+def terms(text: str) -> Set[str]:
+    return {w for w in re.findall(r"\w+", text.lower()) if w not in STOPWORDS}
+
+def query_terms_for(query: str, entity: Entity) -> Set[str]:
+    words= terms(query) - terms(entity.label or "")
+    expanded= set(words)
+    for w in words:
+        expanded |= QUERY_SYNONYMS.get(w, set())
+        if w.endswith("s") and len(w) > 3:
+            expanded.add(w[:-1])
+    return expanded
+
+class ContextPacker:
+
+    def __init__(self, count_tokens: Callable[[str], int], budget: int= RAG_CONTEXT_TOKENS):
+        self.count_tokens= count_tokens
+        self.budget= budget
+
+    def score(self, query_terms: Set[str], line: str, position: int) -> float:
+        prop, _, value= line.partition(": ")
+        prop_terms= terms(prop)
+        value_terms= terms(value)
+        overlap= 2.0 * len(query_terms & prop_terms) + len(query_terms & value_terms)
+        return overlap / math.sqrt(1 + len(prop_terms) + len(value_terms)) + 1.0 / (10 + position)
+
+    def pack(self, query: str, entities: List[Entity], lines: Optional[Dict[str, List[str]]]= None) -> str:
+        used= 0
+        headers: Dict[int, str]= {}
+        candidates: List[Tuple[float, int, int, str, int]]= []
+
+        for ei, e in enumerate(entities):
+            header= e.text_summary() + ". "
+            cost= self.count_tokens(header + "\n")
+            if used + cost > self.budget:
+                logger.debug("context: dropped entity %s, header needs %d tokens with %d/%d used", e.qid, cost, used, self.budget)
+                continue
+            used += cost
+            headers[ei]= header
+            query_terms= query_terms_for(query, e)
+            fact_lines= lines[e.qid] if lines is not None and e.qid in lines else e.relevant_fact_lines()
+            for pos, line in enumerate(fact_lines):
+                candidates.append((self.score(query_terms, line, pos), ei, pos, line, self.count_tokens("; " + line)))
+
+        candidates.sort(key= lambda c: (-c[0], c[1], c[2]))
+        chosen: Dict[int, List[Tuple[int, str]]]= {ei: [] for ei in headers}
+        skipped= 0
+        for score, ei, pos, line, cost in candidates:
+            if used + cost > self.budget:
+                skipped += 1
+                continue
+            used += cost
+            chosen[ei].append((pos, line))
+
+        logger.debug(
+            "context: packed %d/%d facts from %d entities into %d/%d tokens",
+            len(candidates) - skipped, len(candidates), len(headers), used, self.budget,
+        )
+
+        context_str= ""
+        for ei in sorted(headers):
+            lines= [line for _pos, line in sorted(chosen[ei])]
+            context_str += headers[ei] + "; ".join(lines) + "\n"
+        return context_str
@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm.llama_model import LlamaModel
+from objects.entity import Entity
+
+LLM_QUEUE_SIZE= int(os.getenv("LLM_QUEUE_SIZE", "16"))
+LLM_TIMEOUT= float(os.getenv("LLM_TIMEOUT", "120"))
+
+class QueueFullError(Exception):
+    pass
+
+class GenerationJob:
+
+    def __init__(self, query: str, entities: List[Entity], limit: int, min_score: float, deadline: float, loop: asyncio.AbstractEventLoop, context: Optional[contextvars.Context]= None):
+        self.query= query
+        self.entities= entities
+        self.limit= limit
+        self.min_score= min_score
+        self.deadline= deadline
+        self.loop= loop
+        self.context= context
+        self.events: "asyncio.Queue[Tuple[str, Any]]"= asyncio.Queue()
+        self.cancelled= threading.Event()
+        self.stats: Dict[str, Any]= {}
+        self.enqueued_at= time.perf_counter()
+
+    def emit(self, kind: str, value: Any= None) -> None:
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, value))
+
+    def expired(self) -> bool:
+        return self.cancelled.is_set() or time.monotonic() >= self.deadline
+
+class GenerationQueue:
+
+    def __init__(self, model: LlamaModel, max_pending: int= LLM_QUEUE_SIZE, timeout: float= LLM_TIMEOUT):
+        self.model= model
+        self.timeout= timeout
+        self.jobs: "queue.Queue[Optional[GenerationJob]]"= queue.Queue(maxsize= max(1, max_pending))
+        self.lock= threading.Lock()
+        self.completed= 0
+        self.rejected= 0
+        self.timed_out= 0
+        self.thread= threading.Thread(target= self.run, name= "llm-worker", daemon= True)
+        self.thread.start()
+
+    def submit(self, query: str, entities: List[Entity], limit: int, min_score: float, timeout: Optional[float]= None, context: Optional[contextvars.Context]= None) -> GenerationJob:
+        deadline= time.monotonic() + (timeout if timeout is not None else self.timeout)
+        job= GenerationJob(query, entities, limit, min_score, deadline, asyncio.get_running_loop(), context= context)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise QueueFullError(f"LLM queue is full ({self.jobs.maxsize} pending)")
+        return job
+
+    def run(self) -> None:
+        while True:
+            job= self.jobs.get()
+            if job is None:
+                return
+            self.process(job)
+
+    def process(self, job: GenerationJob) -> None:
+        if job.context is not None:
+            job.context.run(self.generate, job)
+        else:
+            self.generate(job)
+
+    def generate(self, job: GenerationJob) -> None:
+        job.stats["queue_wait"]= time.perf_counter() - job.enqueued_at
+        if job.expired():
+            self.finish(job, "timeout" if not job.cancelled.is_set() else "cancelled")
+            return
+        stream= self.model.rag_ask_stream(job.query, limit= job.limit, min_score= job.min_score, stats= job.stats, entities= job.entities)
+        outcome= "done"
+        try:
+            for text in stream:
+                if job.expired():
+                    outcome= "timeout" if not job.cancelled.is_set() else "cancelled"
+                    break
+                job.emit("token", text)
+        except Exception as e:
+            job.emit("error", str(e))
+            outcome= "error"
+        finally:
+            stream.close()
+        self.finish(job, outcome)
+
+    def finish(self, job: GenerationJob, outcome: str) -> None:
+        with self.lock:
+            self.completed += 1
+            if outcome == "timeout":
+                self.timed_out += 1
+        if outcome == "timeout":
+            job.emit("error", "generation timed out")
+        job.emit("done", dict(job.stats, outcome= outcome))
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "pending": self.jobs.qsize(),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def close(self) -> None:
+        self.jobs.put(None)
@@ -1,55 +1,206 @@
 import os
-from llama_cpp import Llama
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from data.data_fetcher import DataFetcher
+from llm.context_packer import ContextPacker
+from llm.prompt_cache import PromptStateCache
+from objects.entity import Entity
+from objects.lazy import is_loaded, lazy_property
 from services.qdrant_wrapper import QdrantWrapper
+from services.query_cache import QueryCache
 from services.sqlite_wrapper import SqliteWrapper
+from services.tracing import tracer
 
 RAG_MODEL= os.getenv("RAG_MODEL")
+RAG_DETERMINISTIC= os.getenv("RAG_DETERMINISTIC", "0") == "1"
+RAG_SEED= int(os.getenv("RAG_SEED", "42"))
+RAG_PROMPT_CACHE= os.getenv("RAG_PROMPT_CACHE", "1") == "1"
+
+SYSTEM_PREFIX= '''<|system|>
+                    You answer ONLY using the FACTS provided. If a detail is not in FACTS, say you don't have it. Keep it concise: 2–4 sentences, ≤80 words. End with a period.</s>
+                    <|user|>
+                    '''
 
 class LlamaModel:
-    def __init__(self, fetcher : DataFetcher, sqlite : SqliteWrapper, qdrant : QdrantWrapper, path= RAG_MODEL):
+    def __init__(self, fetcher : DataFetcher, sqlite : SqliteWrapper, qdrant : QdrantWrapper, path= RAG_MODEL, deterministic : bool= RAG_DETERMINISTIC, cache : Optional[QueryCache]= None, llm : Optional[Any]= None, prefetcher : Optional[Any]= None):
         self.fetcher = fetcher
         self.sqlite = sqlite
         self.qdrant = qdrant
-        self.llm = Llama(model_path = path, n_ctx= 4096, n_gpu_layers= -1, verbose= False)
+        self.deterministic = deterministic
+        self.cache = cache or QueryCache(sqlite)
+        self.last_stats : Dict[str, Any] = {}
+        self.prefetcher = prefetcher
+        self.path = path
+        self.load_lock = threading.Lock()
+        self.packer = ContextPacker(lambda text: len(self.tokenize(text)))
+        self.prompt_cache = None
+        if llm is not None:
+            self.prompt_cache = self.warm_prompt_cache(llm)
+            self.llm = llm
+
+    llm = lazy_property("llm", lambda self: self.load_llm())
+
+    def load_llm(self) -> Any:
+        with self.load_lock:
+            if is_loaded(self, "llm"):
+                return self.llm
+            from llama_cpp import Llama
+            llm = Llama(model_path = self.path, n_ctx= 4096, n_gpu_layers= -1, seed= RAG_SEED, verbose= False)
+            self.prompt_cache = self.warm_prompt_cache(llm)
+            self.llm = llm
+            return llm
+
+    def warm_prompt_cache(self, llm : Any) -> Optional[PromptStateCache]:
+        if not RAG_PROMPT_CACHE:
+            return None
+        prompt_cache = PromptStateCache(llm)
+        prompt_cache.warm_prefix(llm.tokenize(SYSTEM_PREFIX.encode("utf-8"), add_bos= True, special= True))
+        return prompt_cache
+
+    def tokenize(self, text : str, add_bos : bool= False) -> List[int]:
+        return self.llm.tokenize(text.encode("utf-8"), add_bos= add_bos, special= True)
+
+    def generation_settings(self) -> Dict[str, Any]:
+        settings = {
+            "max_tokens": 300,
+            "temperature": 1.0,
+            "top_p": 0.95,
+            "top_k": 40,
+            "repeat_penalty": 1.1,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0,
+            "stop": ["</s>", "<|user|>", "<|system|>"],
+        }
+        if self.deterministic:
+            settings.update({"temperature": 0.0, "top_k": 1, "seed": RAG_SEED})
+        return settings
+
+    def resolvers(self, query : str, limit : int, min_score : float) -> List[Callable[[], List[str]]]:
+        return [
+            lambda: self.fetcher.resolve_local(query, limit),
+            lambda: [e.qid for e in self.qdrant.search_entities(prompt= query, min_score= min_score, limit= limit, load_facts= False)],
+            lambda: self.fetcher.search_for_qid(query, limit),
+        ]
+
+    def resolve_qids(self, query : str, limit = 3, min_score = 0.80) -> Tuple[List[str], bool]:
+        qids = self.cache.get_retrieval(query, limit, min_score)
+        if qids:
+            tracer.count("llm.retrieval_cache_hits")
+            return qids, True
+        for resolve in self.resolvers(query, limit, min_score):
+            qids = resolve()
+            if qids:
+                return qids, False
+        return [], False
 
+    def retrieve(self, query : str, limit = 3, min_score = 0.80) -> List[Entity]:
+        qids = self.cache.get_retrieval(query, limit, min_score)
+        if qids:
+            entities = self.fetcher.get_or_fetch_wikidata_entities_by_qids(qids, load_facts= False)
+            if entities:
+                tracer.count("llm.retrieval_cache_hits")
+                return entities
+
+        # Each resolver only counts if its ids turn into entities; otherwise fall through to the next one.
+        for resolve in self.resolvers(query, limit, min_score):
+            qids = resolve()
+            entities = self.fetcher.get_or_fetch_wikidata_entities_by_qids(qids, load_facts= False) if qids else []
+            if entities:
+                self.cache.put_retrieval(query, limit, min_score, [e.qid for e in entities])
+                return entities
+        return []
+
+    def prompt_parts(self, query : str, entities : List[Entity]) -> List[str]:
+        lines = self.sqlite.get_display_lines([e.qid for e in entities])
+        context_str = self.packer.pack(query, entities, lines)
+        return [
+            SYSTEM_PREFIX,
+            f'''{context_str}
+                    ''',
+            f'''{query}
+                    </s>
+                    <|assistant|>''',
+        ]
+
+    def build_prompt(self, query : str, entities : List[Entity]) -> str:
+        return "".join(self.prompt_parts(query, entities))
+
+    def prepare_prompt(self, query : str, entities : List[Entity], stats : Dict[str, Any]):
+        system, context, question = self.prompt_parts(query, entities)
+        if self.prompt_cache is None:
+            return "".join((system, context, question))
+        context_tokens = self.tokenize(system, add_bos= True) + self.tokenize(context)
+        prompt_tokens = context_tokens + self.tokenize(question)
+        stats.update(self.prompt_cache.prime(context_tokens, len(prompt_tokens)))
+        return prompt_tokens
 
     def rag_ask(self, query : str, limit = 3, min_score = 0.80):
-        contexts = self.qdrant.search_entities(prompt= query, min_score= min_score, limit= limit)
-        relevant = [c for c in contexts if c["score"] >= min_score]
-        entities = []
+        return "".join(self.rag_ask_stream(query, limit= limit, min_score= min_score))
 
-        if not relevant:
-            ids = [i["QID"] for i in self.fetcher.search_for_qid(query, limit) if i["similarity_score"] >= min_score]
-            entities = self.fetcher.get_or_fetch_wikidata_entities_by_qids(ids)
-        else:
-            entities = [self.sqlite.get_entity(r["qid"]) for r in relevant]
+    def rag_ask_stream(self, query : str, limit = 3, min_score = 0.80, stats : Optional[Dict[str, Any]] = None, entities : Optional[List[Entity]] = None) -> Iterator[str]:
+        stats = stats if stats is not None else {}
+        stats.update({"ttft": None, "tokens": 0, "tokens_per_sec": None, "total": None, "cached": False, "cancelled": False})
+        self.last_stats = stats
+        # Callers that already opened a trace (the HTTP server, around retrieval) own it; spans join theirs.
+        trace = None if tracer.active() else tracer.start_trace("rag_ask", query= query, limit= limit, min_score= min_score)
+        try:
+            yield from self.answer_stream(query, limit, min_score, stats, entities)
+        finally:
+            tracer.end_trace(trace, **stats)
+
+    def answer_stream(self, query : str, limit : int, min_score : float, stats : Dict[str, Any], entities : Optional[List[Entity]] = None) -> Iterator[str]:
+        started = time.perf_counter()
+        if entities is None:
+            with tracer.span("llm.retrieve"):
+                entities = self.retrieve(query, limit= limit, min_score= min_score)
 
         if not entities:
-            return "I'm sorry, but there is not enough context for me to answer that."
+            yield "I'm sorry, but there is not enough context for me to answer that."
+            return
+        if self.prefetcher is not None:
+            self.prefetcher.observe(entities)
 
+        settings = self.generation_settings()
+        if self.deterministic:
+            cached = self.cache.get_answer(query, entities, settings)
+            if cached is not None:
+                tracer.count("llm.answer_cache_hits")
+                stats.update({"ttft": time.perf_counter() - started, "total": time.perf_counter() - started, "cached": True})
+                yield cached
+                return
 
-        context_str = ""
-        for e in entities:
-            context_str += e.query_context_str() + "\n"
-        prompt = f'''<|system|>
-                    You answer ONLY using the FACTS provided. If a detail is not in FACTS, say you don't have it. Keep it concise: 2–4 sentences, ≤80 words. End with a period.</s>
-                    <|user|>
-                    {context_str}
-                    {query}
-                    </s>
-                    <|assistant|>'''
-
-        result = self.llm(
-            prompt=prompt,
-            max_tokens=300,
-            temperature=1.0,
-            top_p=0.95,
-            top_k=40,
-            repeat_penalty=1.1,
-            frequency_penalty=0.0,
-            presence_penalty=0.0,
-            stop=["</s>", "<|user|>", "<|system|>"]
-        )
-        return result["choices"][0]["text"]
\ No newline at end of file
+        with tracer.span("llm.prepare_prompt"):
+            prompt = self.prepare_prompt(query, entities, stats)
+        if tracer.enabled:
+            tracer.count("llm.tokens_in", len(prompt) if isinstance(prompt, list) else len(self.tokenize(prompt, add_bos= True)))
+        generate_started = time.perf_counter()
+        stream = self.llm(prompt=prompt, stream=True, **settings)
+        parts: List[str] = []
+        first_token_at = None
+        try:
+            for chunk in stream:
+                text = chunk["choices"][0]["text"]
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    stats["ttft"] = first_token_at - started
+                stats["tokens"] += 1
+                parts.append(text)
+                yield text
+        except (GeneratorExit, KeyboardInterrupt):
+            stats["cancelled"] = True
+            raise
+        finally:
+            stream.close()
+            finished = time.perf_counter()
+            stats["total"] = finished - started
+            if first_token_at is not None and finished > first_token_at:
+                stats["tokens_per_sec"] = stats["tokens"] / (finished - first_token_at)
+            if first_token_at is not None:
+                tracer.record("llm.prefill", first_token_at - generate_started, started= generate_started)
+                tracer.record("llm.decode", finished - first_token_at, started= first_token_at)
+            tracer.count("llm.tokens_out", stats["tokens"])
+
+        if self.deterministic:
+            self.cache.put_answer(query, entities, settings, "".join(parts))
\ No newline at end of file
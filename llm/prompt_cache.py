@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import os
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+RAG_CONTEXT_STATES= int(os.getenv("RAG_CONTEXT_STATES", "4"))
+
+def longest_token_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    n= 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+class PromptStateCache:
+
+    def __init__(self, llm: Any, max_states: int= RAG_CONTEXT_STATES):
+        self.llm= llm
+        self.max_states= max_states
+        self.prefix_tokens: List[int]= []
+        self.prefix_state= None
+        self.states: "OrderedDict[Tuple[int, ...], object]"= OrderedDict()
+        self.lock= threading.Lock()
+        self.prompt_tokens= 0
+        self.saved_tokens= 0
+
+    def warm_prefix(self, prefix_tokens: List[int]) -> None:
+        self.llm.reset()
+        self.llm.eval(prefix_tokens)
+        self.prefix_tokens= list(prefix_tokens)
+        self.prefix_state= self.llm.save_state()
+
+    def restore_best(self, tokens: Sequence[int]) -> int:
+        reuse= longest_token_prefix(self.llm.input_ids[:self.llm.n_tokens].tolist(), tokens)
+        best_key= None
+        for key in self.states:
+            n= longest_token_prefix(key, tokens)
+            if n > reuse:
+                reuse, best_key= n, key
+        if best_key is not None:
+            self.states.move_to_end(best_key)
+            self.llm.load_state(self.states[best_key])
+        elif self.prefix_state is not None and reuse < len(self.prefix_tokens) and list(tokens[:len(self.prefix_tokens)]) == self.prefix_tokens:
+            self.llm.load_state(self.prefix_state)
+            reuse= len(self.prefix_tokens)
+        return reuse
+
+    def prime(self, context_tokens: List[int], prompt_len: int) -> Dict[str, int]:
+        with self.lock:
+            reuse= self.restore_best(context_tokens)
+            self.llm.n_tokens= reuse
+            if reuse < len(context_tokens):
+                self.llm.eval(context_tokens[reuse:])
+                key= tuple(context_tokens)
+                self.states[key]= self.llm.save_state()
+                self.states.move_to_end(key)
+                while len(self.states) > self.max_states:
+                    self.states.popitem(last= False)
+
+            saved= reuse
+            self.prompt_tokens += prompt_len
+            self.saved_tokens += saved
+            return {"prefill_tokens": prompt_len, "prefill_saved": saved}
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "prompt_tokens": self.prompt_tokens,
+                "saved_tokens": self.saved_tokens,
+                "context_states": len(self.states),
+            }
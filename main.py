@@ -1,23 +1,58 @@
+import time
+STARTED_AT= time.perf_counter()
+
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
+
+from data.background_refresher import BackgroundRefresher
 from data.data_fetcher import DataFetcher
+from data.prefetcher import LinkedEntityPrefetcher
 from llm.llama_model import LlamaModel
+from services.cache_manager import CacheManager
 from services.embedder import Embedder
 from services.qdrant_wrapper import QdrantWrapper
 from services.sqlite_wrapper import SqliteWrapper
+from services.startup import StartupLoader
+from services.tracing import tracer
 
 
 def main():
-    embedder= Embedder()
+    startup= StartupLoader(started_at= STARTED_AT)
+    startup.mark("imports")
     sqlite= SqliteWrapper()
+    embedder= Embedder(sqlite= sqlite)
     qdrant= QdrantWrapper(embedder= embedder, sqlite= sqlite)
     fetcher= DataFetcher(sqlite= sqlite, qdrant= qdrant, embedder= embedder)
-    llm= LlamaModel(fetcher= fetcher, sqlite= sqlite, qdrant= qdrant)
+    prefetcher= None
+    if os.getenv("PREFETCH_LINKED", "0") == "1":
+        prefetcher= LinkedEntityPrefetcher(fetcher)
+        prefetcher.start()
+    llm= LlamaModel(fetcher= fetcher, sqlite= sqlite, qdrant= qdrant, prefetcher= prefetcher)
+    startup.submit("embedder", lambda: embedder.model)
+    startup.submit("qdrant", lambda: qdrant.store)
+    startup.submit("llm", lambda: llm.llm)
+    if os.getenv("STARTUP_REPORT", "1") == "1":
+        startup.on_ready(lambda loader: print(f"\n{loader.report()}"))
+    if os.getenv("BACKGROUND_REFRESH", "0") == "1":
+        BackgroundRefresher(fetcher).start()
+    cache_manager= CacheManager(sqlite, qdrant)
+    cache_manager.start()
+    if os.getenv("METRICS_PORT"):
+        tracer.enable()
+        tracer.serve_metrics(int(os.getenv("METRICS_PORT")))
 
     print("Ready! Type only the entity you would like to know about.")
     print("Type 'quit' to stop.")
+    try:
+        repl(llm)
+    finally:
+        cache_manager.stop()
+        qdrant.close()
 
+
+def repl(llm: LlamaModel) -> None:
     while True:
         try:
             query= input("\n> ").strip()
@@ -27,8 +62,20 @@ def main():
             if not query:
                 continue
             
-            answer= llm.rag_ask(query)
-            print(answer)
+            stream= llm.rag_ask_stream(query)
+            try:
+                for text in stream:
+                    print(text, end= "", flush= True)
+            except KeyboardInterrupt:
+                stream.close()
+                print("\n[cancelled]")
+                continue
+            print()
+            stats= llm.last_stats
+            if stats.get("ttft") is not None:
+                rate= f", {stats['tokens_per_sec']:.1f} tok/s" if stats.get("tokens_per_sec") else ""
+                reused= f", {stats['prefill_saved']}/{stats['prefill_tokens']} prompt tokens reused" if stats.get("prefill_tokens") else ""
+                print(f"[first token {stats['ttft']:.2f}s, {stats['tokens']} tokens in {stats['total']:.2f}s{rate}{reused}]")
         except KeyboardInterrupt:
             print("Goodbye!")
             break
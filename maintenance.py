@@ -0,0 +1,41 @@
+import argparse
+import json
+from dotenv import load_dotenv
+load_dotenv()
+
+from services.cache_manager import CacheManager
+from services.sqlite_wrapper import SQLITE_MAX_BYTES, SQLITE_MAX_ENTITIES, SqliteWrapper
+
+
+def main():
+    parser= argparse.ArgumentParser(description= "Inspect, bound and compact the SQLite entity cache.")
+    parser.add_argument("command", choices= ["stats", "evict", "compact"])
+    parser.add_argument("--max-entities", type= int, default= SQLITE_MAX_ENTITIES)
+    parser.add_argument("--max-bytes", type= int, default= SQLITE_MAX_BYTES)
+    parser.add_argument("--full", action= "store_true", help= "run a full VACUUM instead of an incremental one")
+    parser.add_argument("--recompress", action= "store_true", help= "compress fact JSON columns written before compression was enabled")
+    parser.add_argument("--no-qdrant", action= "store_true", help= "do not delete evicted entities from Qdrant")
+    args= parser.parse_args()
+
+    sqlite= SqliteWrapper()
+    qdrant= None
+    if args.command == "evict" and not args.no_qdrant:
+        from services.embedder import Embedder
+        from services.qdrant_wrapper import QdrantWrapper
+        qdrant= QdrantWrapper(embedder= Embedder(sqlite= sqlite), sqlite= sqlite)
+    manager= CacheManager(sqlite, qdrant, max_entities= args.max_entities, max_bytes= args.max_bytes)
+
+    if args.command == "evict":
+        if not manager.enabled:
+            parser.error("set --max-entities or --max-bytes (or SQLITE_MAX_ENTITIES / SQLITE_MAX_BYTES)")
+        print(f"Evicted {len(manager.enforce())} entities.")
+    elif args.command == "compact":
+        if args.recompress:
+            print(f"Recompressed {sqlite.recompress_facts()} facts.")
+        result= manager.compact(full= args.full)
+        print(f"Freed {result['bytes_freed']} bytes ({result['pages_before']} -> {result['pages_after']} pages).")
+    print(json.dumps(sqlite.cache_stats(), indent= 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import hashlib
 import json
 import time
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 from objects.fact import Fact
+from objects.lazy import lazy_property
 
 
 @dataclass
@@ -13,8 +15,11 @@ class Entity:
     description: str
     aliases: List[str]
     sitelinks: Dict[str, str]
-    facts: List[Fact]
+    facts: List[Fact]= lazy_property("facts", lambda e: e.fact_loader(e.qid) if e.fact_loader else [])
     fetched_at: float= 0.0
+    lastrevid: Optional[int]= None
+    modified: Optional[str]= None
+    fact_loader: Optional[Callable[[str], List[Fact]]]= field(default= None, repr= False, compare= False)
 
     def text_summary(self) -> str:
         return f"{self.label}: {self.description}"
@@ -41,8 +46,15 @@ class Entity:
     def query_context_str(self, facts_limit: int= None) -> str:
         return self.text_summary() + ". " + "; ".join(self.relevant_fact_lines(facts_limit))
 
+    def vector_hash(self) -> str:
+        return hashlib.sha256(self.vector_ready_str().encode("utf-8")).hexdigest()
+
     def is_stale(self, max_age_days: int= 365) -> bool:
-        return (time.time() - self.fetched_at) > (max_age_days * 86400)
+        return Entity.age_is_stale(self.fetched_at, max_age_days)
+
+    @staticmethod
+    def age_is_stale(fetched_at: float, max_age_days: int= 365) -> bool:
+        return (time.time() - (fetched_at or 0.0)) > (max_age_days * 86400)
     
     def to_row(self) -> Dict[str, str]:
         return {
@@ -51,5 +63,8 @@ class Entity:
             "description": self.description,
             "aliases_json": json.dumps(self.aliases, ensure_ascii=False),
             "sitelinks_json": json.dumps(self.sitelinks, ensure_ascii=False),
-            "fetched_at": self.fetched_at
-        }
\ No newline at end of file
+            "fetched_at": self.fetched_at,
+            "lastrevid": self.lastrevid,
+            "modified": self.modified,
+            "vector_hash": self.vector_hash(),
+        }
@@ -2,7 +2,10 @@ import calendar
 from dataclasses import dataclass, field
 import json
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+import zlib
+
+from objects.lazy import is_loaded, lazy_property
 
 @dataclass
 class Fact:
@@ -15,14 +18,17 @@ class Fact:
     value_label: Optional[str]= None
     value_literal: Optional[str]= None
     rank: Optional[str]= None
-    qualifiers: Optional[List[Dict[str, Any]]]= None
-    references: Optional[List[Dict[str, Any]]]= None
+    qualifiers: Optional[List[Dict[str, Any]]]= lazy_property("qualifiers", lambda f: json.loads(unpack_json_column(f.qualifiers_json) or "null"))
+    references: Optional[List[Dict[str, Any]]]= lazy_property("references", lambda f: json.loads(unpack_json_column(f.references_json) or "null"))
     fetched_at: float= 0.0
-    display_value: str= field(init= False)
-    display_line: str= field(init= False)
+    display_value: Optional[str]= None
+    display_line: Optional[str]= None
+    qualifiers_json: Union[str, bytes, None]= field(default= None, repr= False, compare= False)
+    references_json: Union[str, bytes, None]= field(default= None, repr= False, compare= False)
 
     def __post_init__(self):
-        self.finalize_display()
+        if self.display_line is None:
+            self.finalize_display()
 
     def finalize_display(self) -> None:
         if self.value_type == "wikibase-entityid":
@@ -38,13 +44,13 @@ class Fact:
         return (time.time() - self.fetched_at) > (max_age_days * 86400)
     
     def valid_context_fact(self) -> bool:
-        vt = (self.value_type or "")
-        if any(v in vt for v in ("monolingualtext", "quantity")):
-            return False
-        pl = (self.property_label or "")
-        if any(p in pl for p in ("image", "logo", "flag", "signature", " ID", "URL", "article", "ISNI", self.pid)):
-            return False
-        return True
+        return is_context_fact(self.pid, self.property_label, self.value_type)
+
+    def json_column(self, name: str) -> Union[str, bytes]:
+        raw = getattr(self, f"{name}_json")
+        if raw is not None and not is_loaded(self, name):
+            return raw
+        return json.dumps(getattr(self, name), ensure_ascii=False)
 
     def to_row(self) -> Dict[str, Any]:
         return {
@@ -57,8 +63,8 @@ class Fact:
             "value_label": self.value_label,
             "value_literal": self.value_literal,
             "rank": self.rank,
-            "qualifiers_json": json.dumps(self.qualifiers, ensure_ascii=False),
-            "references_json": json.dumps(self.references, ensure_ascii=False),
+            "qualifiers_json": self.json_column("qualifiers"),
+            "references_json": self.json_column("references"),
             "fetched_at": self.fetched_at,
             "display_value": self.display_value,
             "display_line": self.display_line,
@@ -108,4 +114,26 @@ class Fact:
 
             return f"{abs(year)}{era(year)}"
         except Exception:
-            return None
\ No newline at end of file
+            return None
+
+
+def pack_json_column(raw: Union[str, bytes, None], min_bytes: int) -> Union[str, bytes, None]:
+    if not isinstance(raw, str) or len(raw) < min_bytes:
+        return raw
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def unpack_json_column(raw: Union[str, bytes, None]) -> Optional[str]:
+    if isinstance(raw, bytes):
+        return zlib.decompress(raw).decode("utf-8")
+    return raw
+
+
+def is_context_fact(pid: str, property_label: Optional[str], value_type: Optional[str]) -> bool:
+    vt = (value_type or "")
+    if any(v in vt for v in ("monolingualtext", "quantity")):
+        return False
+    pl = (property_label or "")
+    if any(p in pl for p in ("image", "logo", "flag", "signature", " ID", "URL", "article", "ISNI", pid)):
+        return False
+    return True
\ No newline at end of file
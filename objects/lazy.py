@@ -0,0 +1,29 @@
+from typing import Any, Callable
+
+# Marks a lazy slot that has not been loaded yet; None and [] are real values.
+_UNSET= object()
+
+
+def lazy_property(name: str, load: Callable[[Any], Any]) -> property:
+    slot= f"_{name}"
+
+    def get(self):
+        value= self.__dict__.get(slot, _UNSET)
+        if value is _UNSET:
+            value= load(self)
+            self.__dict__[slot]= value
+        return value
+
+    def set(self, value):
+        # A dataclass field that declares this property as its default receives the property itself when the argument is omitted.
+        if value is prop:
+            self.__dict__.pop(slot, None)
+            return
+        self.__dict__[slot]= value
+
+    prop= property(get, set)
+    return prop
+
+
+def is_loaded(obj: Any, name: str) -> bool:
+    return obj.__dict__.get(f"_{name}", _UNSET) is not _UNSET
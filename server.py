@@ -0,0 +1,249 @@
+import time
+STARTED_AT= time.perf_counter()
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from data.background_refresher import BackgroundRefresher
+from data.data_fetcher import DataFetcher
+from data.prefetcher import LinkedEntityPrefetcher
+from llm.generation_queue import GenerationQueue, QueueFullError
+from llm.llama_model import LlamaModel
+from objects.entity import Entity
+from services.cache_manager import CacheManager
+from services.embed_batcher import EmbedBatcher
+from services.embedder import Embedder
+from services.qdrant_wrapper import QdrantWrapper
+from services.sqlite_wrapper import SqliteWrapper
+from services.startup import StartupLoader
+from services.tracing import tracer
+
+SERVER_HOST= os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT= int(os.getenv("SERVER_PORT", "8080"))
+RETRIEVAL_WORKERS= int(os.getenv("RETRIEVAL_WORKERS", "8"))
+REQUEST_TIMEOUT= float(os.getenv("REQUEST_TIMEOUT", "120"))
+MAX_BODY_BYTES= 64 * 1024
+
+STATUS_TEXT= {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+class AskServer:
+
+    def __init__(self, model: LlamaModel, generation: GenerationQueue, batcher: Optional[EmbedBatcher]= None, retrieval_workers: int= RETRIEVAL_WORKERS, timeout: float= REQUEST_TIMEOUT):
+        self.model= model
+        self.generation= generation
+        self.batcher= batcher
+        self.timeout= timeout
+        self.pool= ThreadPoolExecutor(max_workers= max(1, retrieval_workers), thread_name_prefix= "retrieval")
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line= (await reader.readline()).decode("latin-1").strip()
+        method, target, _version= request_line.split(" ", 2)
+        headers: Dict[str, str]= {}
+        while True:
+            line= (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value= line.partition(":")
+            headers[name.strip().lower()]= value.strip()
+        length= int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(length)
+        body= await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str= "application/json", extra: Optional[Dict[str, str]]= None) -> None:
+        headers= {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "close"}
+        headers.update(extra or {})
+        head= f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def respond_json(self, writer: asyncio.StreamWriter, status: int, data: Any, extra: Optional[Dict[str, str]]= None) -> None:
+        await self.respond(writer, status, json.dumps(data, default= str).encode("utf-8"), extra= extra)
+
+    async def start_stream(self, writer: asyncio.StreamWriter) -> None:
+        head= "HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        writer.write(head.encode("latin-1"))
+        await writer.drain()
+
+    async def write_event(self, writer: asyncio.StreamWriter, data: Dict[str, Any]) -> None:
+        payload= (json.dumps(data, default= str, ensure_ascii= False) + "\n").encode("utf-8")
+        writer.write(f"{len(payload):X}\r\n".encode("latin-1") + payload + b"\r\n")
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, target, _headers, body= await self.read_request(reader)
+            except OverflowError:
+                await self.respond_json(writer, 413, {"error": "request body too large"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await self.respond_json(writer, 400, {"error": "malformed request"})
+                return
+
+            url= urlparse(target)
+            if url.path == "/health" and method == "GET":
+                await self.respond_json(writer, 200, self.health())
+            elif url.path == "/metrics" and method == "GET":
+                await self.respond(writer, 200, tracer.render_prometheus().encode("utf-8"), content_type= "text/plain; version=0.0.4")
+            elif url.path == "/ask" and method in ("GET", "POST"):
+                params= {k: v[0] for k, v in parse_qs(url.query).items()}
+                if body:
+                    try:
+                        params.update(json.loads(body.decode("utf-8")))
+                    except ValueError:
+                        await self.respond_json(writer, 400, {"error": "body must be JSON"})
+                        return
+                await self.ask(writer, params)
+            else:
+                await self.respond_json(writer, 404, {"error": f"no route for {method} {url.path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def ask(self, writer: asyncio.StreamWriter, params: Dict[str, Any]) -> None:
+        query= str(params.get("query", "")).strip()
+        if not query:
+            await self.respond_json(writer, 400, {"error": "missing query"})
+            return
+        try:
+            limit= int(params.get("limit", 3))
+            min_score= float(params.get("min_score", 0.80))
+            timeout= min(float(params.get("timeout", self.timeout)), self.timeout)
+        except (TypeError, ValueError):
+            await self.respond_json(writer, 400, {"error": "limit, min_score and timeout must be numbers"})
+            return
+
+        # The per-query trace lives in its own context so the retrieval pool thread and the LLM worker both record into it.
+        context= contextvars.copy_context()
+        handle= context.run(tracer.start_trace, "rag_ask", query= query, limit= limit, min_score= min_score)
+        stats: Dict[str, Any]= {}
+        try:
+            await self.answer(writer, query, limit, min_score, timeout, context, stats)
+        finally:
+            context.run(tracer.end_trace, handle, **stats)
+
+    def retrieve(self, query: str, limit: int, min_score: float) -> List[Entity]:
+        with tracer.span("llm.retrieve"):
+            return self.model.retrieve(query, limit, min_score)
+
+    async def answer(self, writer: asyncio.StreamWriter, query: str, limit: int, min_score: float, timeout: float, context: contextvars.Context, stats: Dict[str, Any]) -> None:
+        started= time.monotonic()
+        loop= asyncio.get_running_loop()
+        try:
+            entities= await asyncio.wait_for(loop.run_in_executor(self.pool, context.run, self.retrieve, query, limit, min_score), timeout)
+        except asyncio.TimeoutError:
+            await self.respond_json(writer, 504, {"error": "retrieval timed out"})
+            return
+        except Exception as e:
+            # Wikidata, Qdrant and the embedder sit behind retrieval; report their failures instead of dropping the socket.
+            print(f"[server] retrieval ERROR: {e}")
+            await self.respond_json(writer, 502, {"error": f"retrieval failed: {e}"})
+            return
+        retrieval= time.monotonic() - started
+        stats["retrieval"]= retrieval
+
+        try:
+            job= self.generation.submit(query, entities, limit, min_score, timeout= timeout - retrieval, context= context)
+        except QueueFullError as e:
+            await self.respond_json(writer, 503, {"error": str(e)}, extra= {"Retry-After": "1"})
+            return
+        except Exception as e:
+            print(f"[server] ERROR: {e}")
+            await self.respond_json(writer, 500, {"error": str(e)})
+            return
+
+        try:
+            await self.start_stream(writer)
+            while True:
+                remaining= job.deadline - time.monotonic()
+                kind, value= await asyncio.wait_for(job.events.get(), max(remaining, 0) + 1.0)
+                if kind == "token":
+                    await self.write_event(writer, {"token": value})
+                elif kind == "error":
+                    await self.write_event(writer, {"error": value})
+                elif kind == "done":
+                    stats.update(value)
+                    await self.write_event(writer, {"done": True, "retrieval": retrieval, "stats": value})
+                    break
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except asyncio.TimeoutError:
+            job.cancelled.set()
+            await self.write_event(writer, {"error": "generation timed out"})
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            job.cancelled.set()
+            raise
+
+    def health(self) -> Dict[str, Any]:
+        data: Dict[str, Any]= {"status": "ok", "generation": self.generation.stats()}
+        if self.batcher is not None:
+            data["embedding"]= self.batcher.stats()
+        return data
+
+    async def serve(self, host: str= SERVER_HOST, port: int= SERVER_PORT) -> None:
+        server= await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}/ask")
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self.generation.close()
+        if self.batcher is not None:
+            self.batcher.close()
+        self.pool.shutdown(wait= False)
+
+
+def main():
+    parser= argparse.ArgumentParser(description= "Serve rag_ask over HTTP with streamed NDJSON answers.")
+    parser.add_argument("--host", default= SERVER_HOST)
+    parser.add_argument("--port", type= int, default= SERVER_PORT)
+    args= parser.parse_args()
+
+    startup= StartupLoader(started_at= STARTED_AT)
+    startup.mark("imports")
+    tracer.enable()
+    sqlite= SqliteWrapper()
+    embedder= Embedder(sqlite= sqlite)
+    batcher= EmbedBatcher(embedder)
+    qdrant= QdrantWrapper(embedder= batcher, sqlite= sqlite)
+    fetcher= DataFetcher(sqlite= sqlite, qdrant= qdrant, embedder= embedder)
+    prefetcher= None
+    if os.getenv("PREFETCH_LINKED", "0") == "1":
+        prefetcher= LinkedEntityPrefetcher(fetcher)
+        prefetcher.start()
+    llm= LlamaModel(fetcher= fetcher, sqlite= sqlite, qdrant= qdrant, prefetcher= prefetcher)
+    if os.getenv("BACKGROUND_REFRESH", "0") == "1":
+        BackgroundRefresher(fetcher).start()
+    cache_manager= CacheManager(sqlite, qdrant)
+    cache_manager.start()
+    startup.submit("embedder", lambda: embedder.model)
+    startup.submit("qdrant", lambda: qdrant.store)
+    startup.submit("llm", lambda: llm.llm)
+    startup.on_ready(lambda loader: print(loader.report()))
+    server= AskServer(llm, GenerationQueue(llm), batcher= batcher)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Goodbye!")
+    finally:
+        server.close()
+        cache_manager.stop()
+        qdrant.close()
+
+
+if __name__ == "__main__":
+    main()
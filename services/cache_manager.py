@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from services.qdrant_wrapper import QdrantWrapper
+from services.sqlite_wrapper import SQLITE_MAX_BYTES, SQLITE_MAX_ENTITIES, SqliteWrapper
+
+CACHE_ENFORCE_INTERVAL= float(os.getenv("CACHE_ENFORCE_INTERVAL", "600"))
+CACHE_COMPACT_EVERY= int(os.getenv("CACHE_COMPACT_EVERY", "6"))
+
+class CacheManager:
+
+    def __init__(
+        self,
+        sqlite: SqliteWrapper,
+        qdrant: Optional[QdrantWrapper]= None,
+        max_entities: int= SQLITE_MAX_ENTITIES,
+        max_bytes: int= SQLITE_MAX_BYTES,
+        interval: float= CACHE_ENFORCE_INTERVAL,
+        compact_every: int= CACHE_COMPACT_EVERY,
+    ):
+        self.sqlite= sqlite
+        self.qdrant= qdrant
+        self.max_entities= max_entities
+        self.max_bytes= max_bytes
+        self.interval= interval
+        self.compact_every= compact_every
+        self.lock= threading.Lock()
+        self.stop_event= threading.Event()
+        self.thread: Optional[threading.Thread]= None
+        self.runs= 0
+        self.evicted= 0
+        self.errors= 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entities > 0 or self.max_bytes > 0
+
+    def enforce(self) -> List[str]:
+        with self.lock:
+            evicted= self.sqlite.evict_entities(self.max_entities, self.max_bytes)
+            if evicted and self.qdrant is not None:
+                self.qdrant.delete_entities(evicted)
+            self.evicted += len(evicted)
+            self.runs += 1
+        return evicted
+
+    def compact(self, full: bool= False) -> Dict[str, int]:
+        with self.lock:
+            return self.sqlite.compact(full= full)
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                if not self.enabled:
+                    self.sqlite.flush_access_times()
+                    continue
+                evicted= self.enforce()
+                if evicted:
+                    print(f"[cache] evicted {len(evicted)} least recently used entities")
+                if self.compact_every > 0 and self.runs % self.compact_every == 0:
+                    self.compact()
+            except Exception as e:
+                self.errors += 1
+                print(f"[cache] ERROR: {e}")
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread= threading.Thread(target= self.run, name= "cache-manager", daemon= True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread= None
+        self.sqlite.flush_access_times()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.sqlite.cache_stats(), max_entities= self.max_entities, max_bytes= self.max_bytes, runs= self.runs, evicted= self.evicted, errors= self.errors)
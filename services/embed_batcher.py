@@ -0,0 +1,90 @@
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from services.embedder import Embedder
+from services.tracing import tracer
+
+EMBED_MICRO_BATCH= int(os.getenv("EMBED_MICRO_BATCH", "32"))
+EMBED_MICRO_WAIT_MS= float(os.getenv("EMBED_MICRO_WAIT_MS", "5"))
+
+class EmbedBatcher:
+
+    def __init__(self, embedder: Embedder, max_batch: int= EMBED_MICRO_BATCH, max_wait_ms: float= EMBED_MICRO_WAIT_MS):
+        self.embedder= embedder
+        self.model_name= embedder.model_name
+        self.cache= embedder.cache
+        self.max_batch= max(1, max_batch)
+        self.max_wait= max_wait_ms / 1000
+        self.pending: "queue.Queue[Optional[Tuple[List[str], Future]]]"= queue.Queue()
+        self.lock= threading.Lock()
+        self.batches= 0
+        self.requests= 0
+        self.texts= 0
+        self.thread= threading.Thread(target= self.run, name= "embed-batcher", daemon= True)
+        self.thread.start()
+
+    def embed_text(self, text: str) -> Any:
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: List[str], batch_size: Optional[int]= None) -> List:
+        if not texts:
+            return []
+        fut: Future= Future()
+        self.pending.put((list(texts), fut))
+        return fut.result()
+
+    def collect(self, first: Tuple[List[str], Future]) -> List[Tuple[List[str], Future]]:
+        requests= [first]
+        size= len(first[0])
+        deadline= time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining= deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item= self.pending.get(timeout= remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.pending.put(None)
+                break
+            requests.append(item)
+            size += len(item[0])
+        return requests
+
+    def run(self) -> None:
+        while True:
+            first= self.pending.get()
+            if first is None:
+                return
+            requests= self.collect(first)
+            texts= list(dict.fromkeys(t for batch, _fut in requests for t in batch))
+            try:
+                with tracer.span("embed.micro_batch"):
+                    vectors= dict(zip(texts, self.embedder.embed_texts(texts)))
+            except BaseException as e:
+                for _batch, fut in requests:
+                    fut.set_exception(e)
+                continue
+            with self.lock:
+                self.batches += 1
+                self.requests += len(requests)
+                self.texts += len(texts)
+            for batch, fut in requests:
+                fut.set_result([vectors[t] for t in batch])
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0,
+            }
+
+    def close(self) -> None:
+        self.pending.put(None)
@@ -1,12 +1,53 @@
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import Any, List, Optional
+
+from objects.lazy import is_loaded, lazy_property
+from services.embedding_cache import EmbeddingCache
+from services.sqlite_wrapper import SqliteWrapper
+from services.tracing import tracer
 
 EMBEDDER= os.getenv("EMBEDDER")
+EMBED_BATCH_SIZE= int(os.getenv("EMBED_BATCH_SIZE", "64"))
 
 class Embedder:
 
-    def __init__(self):
-        self.model= SentenceTransformer(EMBEDDER)
+    model= lazy_property("model", lambda self: self.load_model())
+
+    def __init__(self, sqlite: Optional[SqliteWrapper]= None, model_name: str= EMBEDDER, model: Optional[Any]= None):
+        self.model_name= model_name
+        self.load_lock= threading.Lock()
+        if model is not None:
+            self.model= model
+        self.cache= EmbeddingCache(sqlite, model_name) if sqlite is not None else None
+
+    def load_model(self) -> Any:
+        with self.load_lock:
+            if is_loaded(self, "model"):
+                return self.model
+            from sentence_transformers import SentenceTransformer
+            # Publish while still holding the lock so a waiting thread sees it and does not load a second copy.
+            self.model= SentenceTransformer(self.model_name)
+            return self.model
 
     def embed_text(self, text):
-        return self.model.encode([text])[0]
\ No newline at end of file
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: List[str], batch_size: int= EMBED_BATCH_SIZE) -> List:
+        if not texts:
+            return []
+        tracer.count("embed.texts", len(texts))
+        if self.cache is None:
+            with tracer.span("embed.encode"):
+                return list(self.model.encode(texts, batch_size= batch_size))
+
+        with tracer.span("embed.cache"):
+            vectors, missing= self.cache.get_many(texts)
+        tracer.count("embed.cache_hits", len(texts) - len(missing))
+        if missing:
+            with tracer.span("embed.encode"):
+                encoded= self.model.encode(missing, batch_size= batch_size)
+            fresh= dict(zip(missing, encoded))
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+        return [vectors[t] for t in texts]
\ No newline at end of file
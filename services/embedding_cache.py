@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+
+from services.sqlite_wrapper import SqliteWrapper
+
+EMBED_CACHE_SIZE= int(os.getenv("EMBED_CACHE_SIZE", "200000"))
+EMBED_CACHE_MEMORY_SIZE= int(os.getenv("EMBED_CACHE_MEMORY_SIZE", "2048"))
+EMBED_CACHE_DTYPE= os.getenv("EMBED_CACHE_DTYPE", "float16")
+
+class EmbeddingCache:
+
+    def __init__(
+        self,
+        sqlite: SqliteWrapper,
+        model_name: str,
+        max_entries: int= EMBED_CACHE_SIZE,
+        memory_size: int= EMBED_CACHE_MEMORY_SIZE,
+        dtype: str= EMBED_CACHE_DTYPE,
+    ):
+        self.sqlite= sqlite
+        self.model_name= model_name
+        self.max_entries= max_entries
+        self.memory_size= memory_size
+        self.dtype= np.dtype(dtype).name
+        self.lru: "OrderedDict[str, np.ndarray]"= OrderedDict()
+        self.lock= threading.Lock()
+        self.writes_since_evict= 0
+        self.memory_hits= 0
+        self.sqlite_hits= 0
+        self.misses= 0
+
+    def key_for(self, text: str) -> str:
+        digest= hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def remember(self, key: str, vector: np.ndarray) -> None:
+        self.lru[key]= vector
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.memory_size:
+            self.lru.popitem(last= False)
+
+    def get_many(self, texts: List[str]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        vectors: Dict[str, np.ndarray]= {}
+        pending: Dict[str, str]= {}
+
+        with self.lock:
+            for text in dict.fromkeys(texts):
+                key= self.key_for(text)
+                cached= self.lru.get(key)
+                if cached is not None:
+                    self.lru.move_to_end(key)
+                    vectors[text]= cached
+                    self.memory_hits += 1
+                else:
+                    pending[key]= text
+
+        if not pending:
+            return vectors, []
+
+        stored= self.sqlite.get_embeddings(list(pending))
+        self.sqlite.record_embedding_use(list(stored))
+        missing: List[str]= []
+        with self.lock:
+            for key, text in pending.items():
+                row= stored.get(key)
+                if row:
+                    vector= np.frombuffer(row[1], dtype= row[0]).astype(np.float32)
+                    self.remember(key, vector)
+                    vectors[text]= vector
+                    self.sqlite_hits += 1
+                else:
+                    self.misses += 1
+                    missing.append(text)
+
+        return vectors, missing
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        now_ts= time.time()
+        rows= []
+        with self.lock:
+            for text, vector in vectors.items():
+                key= self.key_for(text)
+                vector= np.asarray(vector, dtype= np.float32)
+                self.remember(key, vector)
+                rows.append({
+                    "key": key,
+                    "model": self.model_name,
+                    "dtype": self.dtype,
+                    "vector": vector.astype(self.dtype).tobytes(),
+                    "last_used": now_ts,
+                })
+            self.writes_since_evict += len(rows)
+            should_evict= self.writes_since_evict >= max(1, self.max_entries // 100)
+            if should_evict:
+                self.writes_since_evict= 0
+
+        self.sqlite.upsert_embeddings(rows)
+        if should_evict:
+            self.sqlite.evict_embeddings(self.max_entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "sqlite_hits": self.sqlite_hits,
+                "misses": self.misses,
+                "size": len(self.lru),
+            }
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from services.sqlite_wrapper import SqliteWrapper
+
+LABEL_CACHE_SIZE= int(os.getenv("LABEL_CACHE_SIZE", "50000"))
+LABEL_TTL_DAYS= float(os.getenv("LABEL_TTL_DAYS", "30"))
+
+class LabelCache:
+
+    def __init__(self, sqlite: SqliteWrapper, max_size: int= LABEL_CACHE_SIZE, ttl_days: float= LABEL_TTL_DAYS):
+        self.sqlite= sqlite
+        self.max_size= max_size
+        self.ttl_seconds= ttl_days * 86400
+        self.lru: "OrderedDict[str, Tuple[str, float]]"= OrderedDict()
+        self.lock= threading.Lock()
+        self.memory_hits= 0
+        self.sqlite_hits= 0
+        self.misses= 0
+        self.stale= 0
+
+    def is_fresh(self, fetched_at: float) -> bool:
+        return (time.time() - (fetched_at or 0.0)) <= self.ttl_seconds
+
+    def remember(self, wid: str, label: str, fetched_at: float) -> None:
+        self.lru[wid]= (label, fetched_at)
+        self.lru.move_to_end(wid)
+        while len(self.lru) > self.max_size:
+            self.lru.popitem(last= False)
+
+    def get_many(self, ids: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        labels: Dict[str, str]= {}
+        pending: List[str]= []
+
+        with self.lock:
+            for wid in ids:
+                cached= self.lru.get(wid)
+                if cached and self.is_fresh(cached[1]):
+                    self.lru.move_to_end(wid)
+                    labels[wid]= cached[0]
+                    self.memory_hits += 1
+                else:
+                    pending.append(wid)
+
+        if not pending:
+            return labels, []
+
+        stored= self.sqlite.get_labels(pending)
+        missing: List[str]= []
+        with self.lock:
+            for wid in pending:
+                row= stored.get(wid)
+                if row and self.is_fresh(row[1]):
+                    self.remember(wid, row[0], row[1])
+                    labels[wid]= row[0]
+                    self.sqlite_hits += 1
+                else:
+                    if row:
+                        self.stale += 1
+                    self.misses += 1
+                    missing.append(wid)
+
+        return labels, missing
+
+    def put_many(self, labels: Dict[str, str]) -> None:
+        if not labels:
+            return
+        now_ts= time.time()
+        self.sqlite.upsert_labels(labels, fetched_at= now_ts)
+        with self.lock:
+            for wid, label in labels.items():
+                self.remember(wid, label, now_ts)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "sqlite_hits": self.sqlite_hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "size": len(self.lru),
+            }
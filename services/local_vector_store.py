@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from services.vector_store import VectorStore
+
+LOCAL_VECTOR_DTYPE= os.getenv("LOCAL_VECTOR_DTYPE", "float16")
+LOCAL_SEARCH_BLOCK= int(os.getenv("LOCAL_SEARCH_BLOCK", "65536"))
+LOCAL_INITIAL_CAPACITY= 1024
+LOCAL_LOG_MIN_ENTRIES= int(os.getenv("LOCAL_LOG_MIN_ENTRIES", "100000"))
+
+class LocalIndex:
+
+    def __init__(self, path: str, dtype: str= LOCAL_VECTOR_DTYPE):
+        self.matrix_path= path + ".npy"
+        self.ids_path= path + ".ids.json"
+        self.log_path= path + ".ids.log"
+        self.dtype= np.dtype(dtype)
+        self.matrix: Optional[np.memmap]= None
+        self.ids: List[Optional[str]]= []
+        self.rows: Dict[str, int]= {}
+        self.free: List[int]= []
+        self.log_entries= 0
+        self.changes: List[Tuple[int, Optional[str]]]= []
+        self.load()
+
+    def load(self) -> None:
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.ids_path)):
+            return
+        with open(self.ids_path, "r", encoding= "utf-8") as f:
+            meta= json.load(f)
+        self.matrix= open_memmap(self.matrix_path, mode= "r+")
+        self.dtype= self.matrix.dtype
+        self.ids= meta["ids"]
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding= "utf-8") as f:
+                for line in f:
+                    try:
+                        row, qid= json.loads(line)
+                    except ValueError:
+                        break  # torn last line from a crash mid-append
+                    self.ids.extend([None] * (row + 1 - len(self.ids)))
+                    self.ids[row]= qid
+                    self.log_entries += 1
+        self.rows= {qid: i for i, qid in enumerate(self.ids) if qid is not None}
+        self.free= [i for i, qid in enumerate(self.ids) if qid is None]
+
+    def allocate(self, dim: int, capacity: int) -> None:
+        tmp= self.matrix_path + ".tmp"
+        grown= open_memmap(tmp, mode= "w+", dtype= self.dtype, shape= (capacity, dim))
+        if self.matrix is not None:
+            grown[:len(self.ids)]= self.matrix[:len(self.ids)]
+            del self.matrix
+        grown.flush()
+        del grown
+        os.replace(tmp, self.matrix_path)
+        self.matrix= open_memmap(self.matrix_path, mode= "r+")
+
+    def ensure_capacity(self, dim: int, needed: int) -> None:
+        if self.matrix is None:
+            self.allocate(dim, max(LOCAL_INITIAL_CAPACITY, needed))
+        elif self.matrix.shape[1] != dim:
+            raise ValueError(f"Vector size {dim} does not match local index size {self.matrix.shape[1]}")
+        elif needed > self.matrix.shape[0]:
+            self.allocate(dim, max(needed, self.matrix.shape[0] * 2))
+
+    def add(self, qids: List[str], vectors: np.ndarray) -> None:
+        norms= np.linalg.norm(vectors, axis= 1, keepdims= True)
+        vectors= vectors / np.where(norms == 0, 1, norms)
+
+        new_qids= [q for q in dict.fromkeys(qids) if q not in self.rows]
+        appended= max(0, len(new_qids) - len(self.free))
+        self.ensure_capacity(vectors.shape[1], len(self.ids) + appended)
+
+        for qid, vector in zip(qids, vectors):
+            row= self.rows.get(qid)
+            if row is None:
+                if self.free:
+                    row= self.free.pop()
+                    self.ids[row]= qid
+                else:
+                    row= len(self.ids)
+                    self.ids.append(qid)
+                self.rows[qid]= row
+                self.changes.append((row, qid))
+            self.matrix[row]= vector.astype(self.dtype)
+
+    def remove(self, qids: List[str]) -> None:
+        for qid in qids:
+            row= self.rows.pop(qid, None)
+            if row is None:
+                continue
+            self.ids[row]= None
+            self.matrix[row]= 0
+            self.free.append(row)
+            self.changes.append((row, None))
+
+    def search(self, vector: np.ndarray, limit: int, min_score: float) -> List[Tuple[str, float]]:
+        count= len(self.ids)
+        if self.matrix is None or not self.rows or limit <= 0:
+            return []
+        norm= np.linalg.norm(vector)
+        query= (vector / norm if norm else vector).astype(np.float32)
+
+        scores= np.empty(count, dtype= np.float32)
+        for start in range(0, count, LOCAL_SEARCH_BLOCK):
+            block= self.matrix[start:min(start + LOCAL_SEARCH_BLOCK, count)].astype(np.float32)
+            scores[start:start + len(block)]= block @ query
+        if self.free:
+            scores[self.free]= -np.inf
+
+        k= min(limit, count)
+        top= np.argpartition(-scores, k - 1)[:k]
+        top= top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top if scores[i] >= min_score and self.ids[i] is not None]
+
+    def persist(self) -> None:
+        # Id changes are appended to a log so a batch costs O(batch); the full id list is only
+        # rewritten once the log outgrows it, and on close.
+        if self.matrix is not None:
+            self.matrix.flush()
+        if not os.path.exists(self.ids_path):
+            self.compact()
+            return
+        if self.changes:
+            with open(self.log_path, "a", encoding= "utf-8") as f:
+                f.write("".join(json.dumps([row, qid]) + "\n" for row, qid in self.changes))
+            self.log_entries += len(self.changes)
+            self.changes= []
+        if self.log_entries > max(LOCAL_LOG_MIN_ENTRIES, len(self.ids)):
+            self.compact()
+
+    def compact(self) -> None:
+        if self.matrix is not None:
+            self.matrix.flush()
+        tmp= self.ids_path + ".tmp"
+        with open(tmp, "w", encoding= "utf-8") as f:
+            json.dump({"dtype": self.dtype.name, "ids": self.ids}, f)
+        os.replace(tmp, self.ids_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.log_entries= 0
+        self.changes= []
+
+
+class LocalVectorStore(VectorStore):
+
+    def __init__(self, directory: str, dtype: str= LOCAL_VECTOR_DTYPE):
+        self.directory= directory
+        self.dtype= dtype
+        self.indexes: Dict[str, LocalIndex]= {}
+        self.lock= threading.RLock()
+        os.makedirs(directory, exist_ok= True)
+
+    def index(self, collection: str) -> LocalIndex:
+        idx= self.indexes.get(collection)
+        if idx is None:
+            idx= LocalIndex(os.path.join(self.directory, collection or "default"), dtype= self.dtype)
+            self.indexes[collection]= idx
+        return idx
+
+    def ensure_collection(self, collection: str, size: int) -> None:
+        with self.lock:
+            self.index(collection)
+
+    def upsert(self, collection: str, qids: List[str], vectors: List[Any], payloads: List[Dict[str, Any]], wait: bool= True) -> None:
+        if not qids:
+            return
+        with self.lock:
+            idx= self.index(collection)
+            idx.add(qids, np.asarray(vectors, dtype= np.float32))
+            idx.persist()
+
+    def delete(self, collection: str, qids: List[str]) -> None:
+        with self.lock:
+            idx= self.index(collection)
+            idx.remove(qids)
+            idx.persist()
+
+    def search(self, collection: str, vector: Any, limit: int, min_score: float) -> List[Tuple[str, float]]:
+        with self.lock:
+            return self.index(collection).search(np.asarray(vector, dtype= np.float32), limit, min_score)
+
+    def close(self) -> None:
+        with self.lock:
+            for idx in self.indexes.values():
+                idx.compact()
@@ -1,62 +1,234 @@
+from dataclasses import dataclass, replace
 import os
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance, PointStruct
 
 from objects.entity import Entity
+from objects.lazy import is_loaded, lazy_property
 from services.embedder import Embedder
-from services.sqlite_wrapper import SqliteWrapper
+from services.local_vector_store import LocalVectorStore
+from services.sqlite_wrapper import SQLITE_CACHE, SqliteWrapper
+from services.tracing import tracer
+from services.vector_store import VectorStore
 
 QDRANT_COLLECTION= os.getenv("QDRANT_COLLECTION")
-QDRANT_EMBED_SIZE= os.getenv("QDRANT_EMBED_SIZE")
+QDRANT_EMBED_SIZE= int(os.getenv("QDRANT_EMBED_SIZE", "384"))
+QDRANT_UPSERT_BATCH= int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_PROFILE= os.getenv("QDRANT_PROFILE", "default")
+VECTOR_BACKEND= os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_DIR= os.getenv("LOCAL_VECTOR_DIR") or os.path.join(os.path.dirname(os.path.abspath(SQLITE_CACHE or ".")), "vectors")
+
+@dataclass(frozen=True)
+class QdrantProfile:
+    name: str
+    on_disk: bool= False
+    on_disk_payload: bool= False
+    hnsw_m: int= 16
+    hnsw_ef_construct: int= 100
+    hnsw_on_disk: bool= False
+    search_ef: Optional[int]= None
+    quantization: Optional[str]= None
+    quantile: float= 0.99
+    always_ram: bool= True
+    rescore: bool= True
+    oversampling: float= 2.0
+
+QDRANT_PROFILES: Dict[str, QdrantProfile]= {
+    "default": QdrantProfile("default"),
+    "ram-int8": QdrantProfile("ram-int8", quantization= "int8"),
+    "disk-int8": QdrantProfile("disk-int8", on_disk= True, on_disk_payload= True, quantization= "int8"),
+    "disk": QdrantProfile("disk", on_disk= True, on_disk_payload= True, hnsw_on_disk= True, search_ef= 64),
+}
+
+def profile_from_env(name: str= QDRANT_PROFILE) -> QdrantProfile:
+    if name not in QDRANT_PROFILES:
+        raise ValueError(f"unknown Qdrant profile {name!r}, expected one of {', '.join(QDRANT_PROFILES)}")
+    overrides: Dict[str, Any]= {}
+    for field, env in (("hnsw_m", "QDRANT_HNSW_M"), ("hnsw_ef_construct", "QDRANT_HNSW_EF_CONSTRUCT"), ("search_ef", "QDRANT_HNSW_EF")):
+        if os.getenv(env):
+            overrides[field]= int(os.getenv(env))
+    if os.getenv("QDRANT_OVERSAMPLING"):
+        overrides["oversampling"]= float(os.getenv("QDRANT_OVERSAMPLING"))
+    return replace(QDRANT_PROFILES[name], **overrides)
+
+def point_id_from_qid(qid: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"wikidata:{qid}"))
+
+class QdrantVectorStore(VectorStore):
+
+    def __init__(self, host: str= "localhost", port: int= 6333, profile: Optional[QdrantProfile]= None, client: Optional[Any]= None):
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models
+        self.models= models
+        self.profile= profile or profile_from_env()
+        self.client= client if client is not None else QdrantClient(host, port= port)
+
+    def collection_config(self, size: int) -> Dict[str, Any]:
+        m= self.models
+        p= self.profile
+        config: Dict[str, Any]= {
+            "vectors_config": m.VectorParams(size= size, distance= m.Distance.COSINE, on_disk= p.on_disk),
+            "hnsw_config": m.HnswConfigDiff(m= p.hnsw_m, ef_construct= p.hnsw_ef_construct, on_disk= p.hnsw_on_disk),
+            "on_disk_payload": p.on_disk_payload,
+        }
+        if p.quantization:
+            config["quantization_config"]= self.quantization_config()
+        return config
+
+    def quantization_config(self) -> Any:
+        m= self.models
+        p= self.profile
+        return m.ScalarQuantization(scalar= m.ScalarQuantizationConfig(type= m.ScalarType.INT8, quantile= p.quantile, always_ram= p.always_ram))
+
+    def search_params(self) -> Any:
+        p= self.profile
+        quantization= None
+        if p.quantization:
+            quantization= self.models.QuantizationSearchParams(rescore= p.rescore, oversampling= p.oversampling)
+        return self.models.SearchParams(hnsw_ef= p.search_ef, quantization= quantization)
+
+    def ensure_collection(self, collection: str, size: int) -> None:
+        if not self.client.collection_exists(collection):
+            self.client.create_collection(collection, **self.collection_config(size))
+        else:
+            self.sync_collection(collection, size)
+        if "qid" not in (self.client.get_collection(collection).payload_schema or {}):
+            self.client.create_payload_index(collection, field_name= "qid", field_schema= self.models.PayloadSchemaType.KEYWORD)
+
+    def profile_diff(self, info: Any) -> Dict[str, Any]:
+        m= self.models
+        p= self.profile
+        vectors= info.config.params.vectors
+        hnsw= info.config.hnsw_config
+        current_quantization= getattr(info.config.quantization_config, "scalar", None)
+        diff: Dict[str, Any]= {}
+        if isinstance(vectors, m.VectorParams) and bool(vectors.on_disk) != p.on_disk:
+            diff["vectors_config"]= {"": m.VectorParamsDiff(on_disk= p.on_disk)}
+        if bool(info.config.params.on_disk_payload) != p.on_disk_payload:
+            diff["collection_params"]= m.CollectionParamsDiff(on_disk_payload= p.on_disk_payload)
+        if (hnsw.m, hnsw.ef_construct, bool(hnsw.on_disk)) != (p.hnsw_m, p.hnsw_ef_construct, p.hnsw_on_disk):
+            diff["hnsw_config"]= m.HnswConfigDiff(m= p.hnsw_m, ef_construct= p.hnsw_ef_construct, on_disk= p.hnsw_on_disk)
+        if p.quantization == "int8":
+            wanted= (m.ScalarType.INT8, p.quantile, p.always_ram)
+            if current_quantization is None or (current_quantization.type, current_quantization.quantile, bool(current_quantization.always_ram)) != wanted:
+                diff["quantization_config"]= self.quantization_config()
+        elif info.config.quantization_config is not None:
+            diff["quantization_config"]= m.Disabled.DISABLED
+        return diff
+
+    def sync_collection(self, collection: str, size: int) -> None:
+        info= self.client.get_collection(collection)
+        vectors= info.config.params.vectors
+        if isinstance(vectors, self.models.VectorParams) and vectors.size != size:
+            print(f"[qdrant] WARNING: collection {collection} has {vectors.size}-d vectors, expected {size}; recreate it to change the size")
+        diff= self.profile_diff(info)
+        if diff:
+            print(f"[qdrant] updating collection {collection} to profile {self.profile.name}: {', '.join(diff)}")
+            self.client.update_collection(collection, **diff)
+
+    def upsert(self, collection: str, qids: List[str], vectors: List[Any], payloads: List[Dict[str, Any]], wait: bool= True) -> None:
+        points= [
+            self.models.PointStruct(id= point_id_from_qid(qid), vector= vector, payload= payload)
+            for qid, vector, payload in zip(qids, vectors, payloads)
+        ]
+        self.client.upsert(collection_name= collection, points= points, wait= wait)
+
+    def delete(self, collection: str, qids: List[str]) -> None:
+        self.client.delete(collection_name= collection, points_selector= [point_id_from_qid(q) for q in qids])
+
+    def search(self, collection: str, vector: Any, limit: int, min_score: float) -> List[Tuple[str, float]]:
+        hits= self.client.query_points(
+            collection_name= collection,
+            query= list(map(float, vector)),
+            limit= limit,
+            score_threshold= min_score,
+            search_params= self.search_params(),
+            with_payload= ["qid"],
+        ).points
+        return [((h.payload or {}).get("qid"), h.score) for h in hits]
 
 class QdrantWrapper:
 
-    def __init__(self, embedder: Embedder, sqlite: SqliteWrapper, host: str= "localhost", port: int= 6333):
+    store= lazy_property("store", lambda self: self.connect())
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        sqlite: SqliteWrapper,
+        host: str= "localhost",
+        port: int= 6333,
+        store: Optional[VectorStore]= None,
+        backend: str= VECTOR_BACKEND,
+        profile: Optional[QdrantProfile]= None,
+    ):
         self.embedder= embedder
         self.sqlite= sqlite
-        self.client= QdrantClient(host, port= port)
-        self.ensure_collection()
+        self.host= host
+        self.port= port
+        self.backend= backend
+        self.profile= profile
+        self.connect_lock= threading.Lock()
+        if store is not None:
+            self.store= store
+            self.ensure_collection()
+
+    def connect(self) -> VectorStore:
+        with self.connect_lock:
+            if is_loaded(self, "store"):
+                return self.store
+            if self.backend == "local":
+                store= LocalVectorStore(LOCAL_VECTOR_DIR)
+            else:
+                store= QdrantVectorStore(self.host, port= self.port, profile= self.profile)
+            store.ensure_collection(QDRANT_COLLECTION, QDRANT_EMBED_SIZE)
+            self.store= store
+            return store
 
     def ensure_collection(self, collection: str= QDRANT_COLLECTION, size: int= QDRANT_EMBED_SIZE) -> None:
-        if not self.client.collection_exists(collection):
-            self.client.create_collection(
-                collection,
-                vectors_config= VectorParams(size= size, distance= Distance.COSINE)
-            )
+        self.store.ensure_collection(collection, size)
 
     def point_id_from_qid(self, qid: str) -> str:
-        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"wikidata:{qid}"))
+        return point_id_from_qid(qid)
+
+    def entity_payload(self, entity: Entity) -> Dict[str, Any]:
+        return {
+            "qid": entity.qid,
+            "label": entity.label,
+            "description": entity.description,
+        }
 
     def upsert_entity(self, entity: Entity, collection: str= QDRANT_COLLECTION) -> None:
-        point_id = self.point_id_from_qid(entity.qid)
-        text= entity.vector_ready_str()
-        vector= self.embedder.embed_text(text)
-        point= PointStruct(
-            id=point_id,
-            vector=vector,
-            payload={
-                "qid": entity.qid,
-                "label": entity.label,
-                "description": entity.description,
-            },
-        )
-        self.client.upsert(collection_name=collection, points=[point])
+        self.upsert_entities([entity], collection= collection)
+
+    def upsert_entities(self, entities: List[Entity], collection: str= QDRANT_COLLECTION, batch_size: int= QDRANT_UPSERT_BATCH, wait: bool= True) -> None:
+        if not entities:
+            return
+        vectors= self.embedder.embed_texts([e.vector_ready_str() for e in entities])
+        for i in range(0, len(entities), batch_size):
+            batch= entities[i:i + batch_size]
+            self.store.upsert(
+                collection,
+                [e.qid for e in batch],
+                vectors[i:i + batch_size],
+                [self.entity_payload(e) for e in batch],
+                wait= wait,
+            )
 
     def delete_entity(self, qid: str, collection: str= QDRANT_COLLECTION) -> None:
-        point_id = self.point_id_from_qid(qid)
-        self.client.delete(collection_name= collection, points_selector= [point_id])
+        self.delete_entities([qid], collection= collection)
+
+    def delete_entities(self, qids: List[str], collection: str= QDRANT_COLLECTION) -> None:
+        if qids:
+            self.store.delete(collection, qids)
+
+    def close(self) -> None:
+        if is_loaded(self, "store"):
+            self.store.close()
 
-    def search_entities(self, prompt: str, min_score: float= 0.80, limit: int= 3, collection: str= QDRANT_COLLECTION) -> List[Entity]:
+    def search_entities(self, prompt: str, min_score: float= 0.80, limit: int= 3, collection: str= QDRANT_COLLECTION, load_facts: bool= True) -> List[Entity]:
         vector= self.embedder.embed_text(prompt)
-        hits= self.client.search(collection_name= collection, query_vector= vector, limit= limit)
-        entities: List[Entity]= []
-        for h in hits:
-            if h.score >= min_score:
-                qid = (h.payload or {}).get("qid")
-                if qid:
-                    ent = self.sqlite.get_entity(qid)
-                    if ent:
-                        entities.append(ent)
-        return entities
\ No newline at end of file
+        with tracer.span("vector.search"):
+            hits= self.store.search(collection, vector, limit, min_score)
+        tracer.count("vector.hits", len(hits))
+        return self.sqlite.get_entities([qid for qid, _score in hits if qid], load_facts= load_facts)
\ No newline at end of file
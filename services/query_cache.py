@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from objects.entity import Entity
+from services.sqlite_wrapper import SqliteWrapper
+
+RETRIEVAL_CACHE_SIZE= int(os.getenv("RETRIEVAL_CACHE_SIZE", "10000"))
+RETRIEVAL_CACHE_TTL= float(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))
+ANSWER_CACHE_SIZE= int(os.getenv("ANSWER_CACHE_SIZE", "5000"))
+ANSWER_CACHE_TTL= float(os.getenv("ANSWER_CACHE_TTL", str(7 * 86400)))
+QUERY_CACHE_PERSIST= os.getenv("QUERY_CACHE_PERSIST", "1") == "1"
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip("?.! ")
+
+class CacheTier:
+
+    def __init__(self, name: str, sqlite: Optional[SqliteWrapper], max_size: int, ttl_seconds: float):
+        self.name= name
+        self.sqlite= sqlite
+        self.max_size= max_size
+        self.ttl_seconds= ttl_seconds
+        self.lru: "OrderedDict[str, Tuple[Any, float]]"= OrderedDict()
+        self.lock= threading.Lock()
+        self.puts_since_prune= 0
+        self.hits= 0
+        self.misses= 0
+
+    def key_for(self, parts: Any) -> str:
+        raw= json.dumps(parts, sort_keys= True, ensure_ascii= False)
+        return f"{self.name}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def is_fresh(self, created_at: float) -> bool:
+        return (time.time() - created_at) <= self.ttl_seconds
+
+    def remember(self, key: str, value: Any, created_at: float) -> None:
+        self.lru[key]= (value, created_at)
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_size:
+            self.lru.popitem(last= False)
+
+    def get(self, parts: Any) -> Optional[Any]:
+        key= self.key_for(parts)
+        with self.lock:
+            cached= self.lru.get(key)
+            if cached and self.is_fresh(cached[1]):
+                self.lru.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+
+        stored= self.sqlite.get_cached_value(key) if self.sqlite is not None else None
+        with self.lock:
+            if stored and self.is_fresh(stored[1]):
+                value= json.loads(stored[0])
+                self.remember(key, value, stored[1])
+                self.hits += 1
+                return value
+            self.lru.pop(key, None)
+            self.misses += 1
+        return None
+
+    def put(self, parts: Any, value: Any) -> None:
+        key= self.key_for(parts)
+        now_ts= time.time()
+        with self.lock:
+            self.remember(key, value, now_ts)
+            self.puts_since_prune += 1
+            should_prune= self.puts_since_prune >= max(1, self.max_size // 100)
+            if should_prune:
+                self.puts_since_prune= 0
+
+        if self.sqlite is not None:
+            self.sqlite.put_cached_value(key, self.name, json.dumps(value, ensure_ascii= False), now_ts)
+            if should_prune:
+                self.sqlite.prune_cached_values(self.name, self.max_size, now_ts - self.ttl_seconds)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.lru)}
+
+class QueryCache:
+
+    def __init__(self, sqlite: SqliteWrapper, persist: bool= QUERY_CACHE_PERSIST):
+        store= sqlite if persist else None
+        self.retrieval= CacheTier("retrieval", store, RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+        self.answers= CacheTier("answer", store, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+
+    def get_retrieval(self, query: str, limit: int, min_score: float) -> Optional[List[str]]:
+        return self.retrieval.get([normalize_query(query), limit, min_score])
+
+    def put_retrieval(self, query: str, limit: int, min_score: float, qids: List[str]) -> None:
+        self.retrieval.put([normalize_query(query), limit, min_score], qids)
+
+    def answer_parts(self, query: str, entities: Sequence[Entity], settings: Dict[str, Any]) -> List[Any]:
+        return [normalize_query(query), [[e.qid, e.fetched_at] for e in entities], settings]
+
+    def get_answer(self, query: str, entities: Sequence[Entity], settings: Dict[str, Any]) -> Optional[str]:
+        return self.answers.get(self.answer_parts(query, entities, settings))
+
+    def put_answer(self, query: str, entities: Sequence[Entity], settings: Dict[str, Any], answer: str) -> None:
+        self.answers.put(self.answer_parts(query, entities, settings), answer)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"retrieval": self.retrieval.stats(), "answer": self.answers.stats()}
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import Future
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+class SingleFlight:
+
+    def __init__(self):
+        self.lock= threading.Lock()
+        self.in_flight: Dict[Hashable, Future]= {}
+        self.calls= 0
+        self.leader_keys= 0
+        self.coalesced_keys= 0
+
+    def do_many(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        owned: Dict[Hashable, Future]= {}
+        waiting: Dict[Hashable, Future]= {}
+
+        with self.lock:
+            self.calls += 1
+            for key in dict.fromkeys(keys):
+                fut= self.in_flight.get(key)
+                if fut is None:
+                    fut= Future()
+                    self.in_flight[key]= fut
+                    owned[key]= fut
+                else:
+                    waiting[key]= fut
+            self.leader_keys += len(owned)
+            self.coalesced_keys += len(waiting)
+
+        results: Dict[Hashable, Any]= {}
+        if owned:
+            try:
+                produced= fn(list(owned)) or {}
+            except BaseException as e:
+                self.finish(owned, {}, error= e)
+                raise
+            self.finish(owned, produced)
+            for key in owned:
+                results[key]= produced.get(key)
+
+        for key, fut in waiting.items():
+            results[key]= fut.result()
+        return results
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        return self.do_many([key], lambda _keys: {key: fn()})[key]
+
+    async def do_many_async(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        loop= asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.do_many, list(keys), fn)
+
+    def finish(self, owned: Dict[Hashable, Future], produced: Dict[Hashable, Any], error: BaseException= None) -> None:
+        with self.lock:
+            for key in owned:
+                self.in_flight.pop(key, None)
+        for key, fut in owned.items():
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(produced.get(key))
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "leader_keys": self.leader_keys,
+                "coalesced_keys": self.coalesced_keys,
+                "in_flight": len(self.in_flight),
+            }
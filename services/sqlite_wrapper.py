@@ -1,18 +1,87 @@
 import json
 import os
-from typing import List, Optional
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import sqlite_utils
 from sqlite_utils.db import NotFoundError
 
 from objects.entity import Entity
-from objects.fact import Fact
+from objects.fact import Fact, is_context_fact, pack_json_column
+from services.tracing import tracer
 
 SQLITE_CACHE= os.getenv("SQLITE_CACHE")
+SQLITE_MAX_VARS= 900
+SQLITE_JOURNAL_MODE= os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS= os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE= int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE= int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
+SQLITE_BUSY_TIMEOUT= int(os.getenv("SQLITE_BUSY_TIMEOUT", "10000"))
+SQLITE_AUTO_VACUUM= os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL")
+SQLITE_COMPRESS_MIN_BYTES= int(os.getenv("SQLITE_COMPRESS_MIN_BYTES", "256"))
+SQLITE_ACCESS_GRANULARITY= float(os.getenv("SQLITE_ACCESS_GRANULARITY", "300"))
+SQLITE_ACCESS_BUFFER= int(os.getenv("SQLITE_ACCESS_BUFFER", "100000"))
+SQLITE_MAX_ENTITIES= int(os.getenv("SQLITE_MAX_ENTITIES", "0"))
+SQLITE_MAX_BYTES= int(os.getenv("SQLITE_MAX_BYTES", "0"))
+COMPRESSED_FACT_COLUMNS= ("qualifiers_json", "references_json")
+ENTITY_CACHE_TABLES= ("entities", "facts", "entity_names", "entity_names_fts")
+
+NAME_KIND_LABEL= 0
+NAME_KIND_ALIAS= 1
+NAME_KIND_SITELINK= 2
+NAME_INDEX_SCHEMA= '''
+CREATE TABLE IF NOT EXISTS entity_names (id INTEGER PRIMARY KEY, qid TEXT NOT NULL, name TEXT NOT NULL, norm TEXT NOT NULL, kind INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_entity_names_qid ON entity_names (qid);
+CREATE INDEX IF NOT EXISTS idx_entity_names_norm ON entity_names (norm);
+CREATE VIRTUAL TABLE IF NOT EXISTS entity_names_fts USING fts5(name, content='entity_names', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS entity_names_ai AFTER INSERT ON entity_names BEGIN
+    INSERT INTO entity_names_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS entity_names_ad AFTER DELETE ON entity_names BEGIN
+    INSERT INTO entity_names_fts (entity_names_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+'''
+
+def normalize_name(text: str) -> str:
+    folded= "".join(c for c in unicodedata.normalize("NFKD", text.casefold()) if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", folded.strip()).rstrip("?.! ")
+
+def entity_name_rows(qid: str, label: Optional[str], aliases: List[str], sitelinks: Dict[str, str]) -> List[Tuple[str, str, str, int]]:
+    rows= []
+    seen= set()
+    names= [(label, NAME_KIND_LABEL)] + [(a, NAME_KIND_ALIAS) for a in aliases] + [(t, NAME_KIND_SITELINK) for t in sitelinks.values()]
+    for name, kind in names:
+        norm= normalize_name(name or "")
+        if norm and norm not in seen:
+            seen.add(norm)
+            rows.append((qid, name, norm, kind))
+    return rows
 
 class SqliteWrapper:
 
-    def __init__(self, path: str= SQLITE_CACHE):
-        self.db= sqlite_utils.Database(path)
+    def __init__(
+        self,
+        path: str= SQLITE_CACHE,
+        journal_mode: str= SQLITE_JOURNAL_MODE,
+        synchronous: str= SQLITE_SYNCHRONOUS,
+        cache_size: int= SQLITE_CACHE_SIZE,
+        mmap_size: int= SQLITE_MMAP_SIZE,
+    ):
+        self.path= path
+        self.pragmas= {
+            "journal_mode": journal_mode,
+            "synchronous": synchronous,
+            "cache_size": int(cache_size),
+            "mmap_size": int(mmap_size),
+            "busy_timeout": SQLITE_BUSY_TIMEOUT,
+        }
+        self.local= threading.local()
+        self.access_lock= threading.Lock()
+        self.access_times: Dict[str, float]= {}
+        self.embedding_uses: Dict[str, float]= {}
 
         if "entities" not in self.db.table_names():
             self.db["entities"].create(
@@ -23,11 +92,20 @@ class SqliteWrapper:
                     "aliases_json": str,
                     "sitelinks_json": str,
                     "fetched_at": float,
+                    "lastrevid": int,
+                    "modified": str,
+                    "vector_hash": str,
+                    "last_accessed": float,
                 },
                 pk="qid",
                 if_not_exists=True,
             )
 
+        entity_columns= self.db["entities"].columns_dict
+        for column, column_type in (("lastrevid", int), ("modified", str), ("vector_hash", str), ("last_accessed", float)):
+            if column not in entity_columns:
+                self.db["entities"].add_column(column, column_type)
+
         if "facts" not in self.db.table_names():
             self.db["facts"].create(
                 {
@@ -50,11 +128,133 @@ class SqliteWrapper:
                 foreign_keys=[("subject_qid", "entities", "qid")],
                 if_not_exists=True,
             )
+
+        if "labels" not in self.db.table_names():
+            self.db["labels"].create(
+                {
+                    "id": str,
+                    "label": str,
+                    "fetched_at": float,
+                },
+                pk="id",
+                if_not_exists=True,
+            )
+
+        if "embeddings" not in self.db.table_names():
+            self.db["embeddings"].create(
+                {
+                    "key": str,
+                    "model": str,
+                    "dtype": str,
+                    "vector": bytes,
+                    "last_used": float,
+                },
+                pk="key",
+                if_not_exists=True,
+            )
+
+        if "query_cache" not in self.db.table_names():
+            self.db["query_cache"].create(
+                {
+                    "key": str,
+                    "tier": str,
+                    "value_json": str,
+                    "created_at": float,
+                },
+                pk="key",
+                if_not_exists=True,
+            )
+
+        if "entity_names" not in self.db.table_names():
+            self.create_name_index()
         
         self.db["facts"].create_index(["subject_qid"], if_not_exists=True)
+        self.db["embeddings"].create_index(["last_used"], if_not_exists=True)
+        self.db["query_cache"].create_index(["tier", "created_at"], if_not_exists=True)
         self.db["entities"].create_index(["qid"], if_not_exists=True)
         self.db["facts"].create_index(["guid"], if_not_exists=True)
 
+    @property
+    def db(self) -> sqlite_utils.Database:
+        db= getattr(self.local, "db", None)
+        if db is None:
+            db= sqlite_utils.Database(self.path)
+            db.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+            # auto_vacuum only sticks on an empty file, before WAL is enabled; older files are converted by compact().
+            if not db.execute("SELECT 1 FROM sqlite_schema LIMIT 1").fetchone():
+                db.execute(f"PRAGMA auto_vacuum={SQLITE_AUTO_VACUUM}")
+            for name, value in self.pragmas.items():
+                db.execute(f"PRAGMA {name}={value}")
+            self.local.db= db
+        return db
+
+    def chunks(self, items: List[str], size: int= SQLITE_MAX_VARS) -> Iterable[List[str]]:
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]], pk: str) -> None:
+        if not rows:
+            return
+        columns= list(rows[0])
+        updates= ", ".join(f"[{c}]= excluded.[{c}]" for c in columns if c != pk) or f"[{pk}]= excluded.[{pk}]"
+        sql= (
+            f"INSERT INTO [{table}] ({', '.join(f'[{c}]' for c in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT([{pk}]) DO UPDATE SET {updates}"
+        )
+        self.db.conn.executemany(sql, [[r.get(c) for c in columns] for r in rows])
+
+    def delete_where_in(self, table: str, column: str, values: List[str]) -> None:
+        for batch in self.chunks(values):
+            placeholders= ", ".join("?" for _ in batch)
+            self.db.conn.execute(f"DELETE FROM [{table}] WHERE [{column}] IN ({placeholders})", batch)
+
+    def encode_fact_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if SQLITE_COMPRESS_MIN_BYTES <= 0:
+            return row
+        for column in COMPRESSED_FACT_COLUMNS:
+            row[column]= pack_json_column(row.get(column), SQLITE_COMPRESS_MIN_BYTES)
+        return row
+
+    def create_name_index(self) -> None:
+        self.db.conn.executescript(NAME_INDEX_SCHEMA)
+        rows= []
+        for er in self.db.query("SELECT qid, label, aliases_json, sitelinks_json FROM [entities]"):
+            rows.extend(entity_name_rows(er["qid"], er["label"], json.loads(er["aliases_json"] or "[]"), json.loads(er["sitelinks_json"] or "{}")))
+        with self.db.conn:
+            self.db.conn.executemany("INSERT INTO entity_names (qid, name, norm, kind) VALUES (?, ?, ?, ?)", rows)
+
+    def index_entity_names(self, entities: List[Entity]) -> None:
+        self.delete_where_in("entity_names", "qid", list(dict.fromkeys(e.qid for e in entities)))
+        rows= [r for e in entities for r in entity_name_rows(e.qid, e.label, e.aliases or [], e.sitelinks or {})]
+        self.db.conn.executemany("INSERT INTO entity_names (qid, name, norm, kind) VALUES (?, ?, ?, ?)", rows)
+
+    def search_entity_names(self, query: str, limit: int= 3) -> List[str]:
+        norm= normalize_name(query)
+        if not norm:
+            return []
+        with tracer.span("sqlite.search_entity_names"):
+            exact= self.db.execute(
+                "SELECT qid FROM entity_names WHERE norm= ? GROUP BY qid ORDER BY MIN(kind), qid LIMIT ?",
+                (norm, limit),
+            ).fetchall()
+            if exact:
+                return [r[0] for r in exact]
+
+            tokens= re.findall(r"\w+", norm)
+            if not tokens:
+                return []
+            # "^" anchors the phrase to the first token, so only names that start with the query are candidates;
+            # ranking them by kind and length in SQL keeps the shortest matches inside the LIMIT.
+            rows= self.db.execute(
+                "SELECT n.qid, n.norm, n.kind, bm25(entity_names_fts) AS score FROM entity_names_fts "
+                "JOIN entity_names n ON n.id = entity_names_fts.rowid "
+                "WHERE entity_names_fts MATCH ? ORDER BY n.kind, length(n.norm), score LIMIT ?",
+                ('^"' + " ".join(tokens) + '"*', limit * 20),
+            ).fetchall()
+        prefix= sorted((kind, len(name_norm), score, qid) for qid, name_norm, kind, score in rows if name_norm.startswith(norm))
+        return list(dict.fromkeys(qid for _kind, _len, _score, qid in prefix))[:limit]
+
     def row_to_fact(self, fr: dict) -> Fact:
         return Fact(
             guid= fr["guid"],
@@ -66,21 +266,28 @@ class SqliteWrapper:
             value_label= fr.get("value_label"),
             value_literal= fr.get("value_literal"),
             rank= fr.get("rank"),
-            qualifiers= json.loads(fr.get("qualifiers_json") or "null"),
-            references= json.loads(fr.get("references_json") or "null"),
-            fetched_at= fr["fetched_at"]
+            qualifiers_json= fr.get("qualifiers_json"),
+            references_json= fr.get("references_json"),
+            fetched_at= fr["fetched_at"],
+            display_value= fr.get("display_value"),
+            display_line= fr.get("display_line"),
             )
     
-    def row_to_entity(self, er: dict) -> Entity:
-        return Entity(
+    def row_to_entity(self, er: dict, facts: Optional[List[Fact]]= None) -> Entity:
+        entity= Entity(
             qid= er["qid"],
             label= er["label"],
             description= er["description"],
             aliases= json.loads(er["aliases_json"] or "null"),
             sitelinks= json.loads(er["sitelinks_json"] or "null"),
-            facts= self.get_facts_by_subject(er["qid"]),
-            fetched_at= er["fetched_at"]
+            fetched_at= er["fetched_at"],
+            lastrevid= er.get("lastrevid"),
+            modified= er.get("modified"),
+            fact_loader= None if facts is not None else self.get_facts_by_subject,
         )
+        if facts is not None:
+            entity.facts= facts
+        return entity
     
     def get_fact(self, guid: str, table: str= "facts") -> Optional[Fact]:
         try:
@@ -100,26 +307,358 @@ class SqliteWrapper:
             result.append(self.row_to_fact(fr))
         return result
 
+    def get_facts_by_subjects(self, subject_qids: List[str], table: str= "facts") -> Dict[str, List[Fact]]:
+        grouped: Dict[str, List[Fact]]= {qid: [] for qid in subject_qids}
+        for batch in self.chunks(list(grouped)):
+            placeholders= ", ".join("?" for _ in batch)
+            frs= self.db.query(f"SELECT * FROM [{table}] WHERE subject_qid IN ({placeholders}) ORDER BY rowid", batch)
+            for fr in frs:
+                grouped[fr["subject_qid"]].append(self.row_to_fact(fr))
+        return grouped
+
     def get_entity(self, qid: str, table: str= "entities") -> Optional[Entity]:
-        try:
-            er= self.db[table].get(qid)
-        except NotFoundError:
-            return None
-        return self.row_to_entity(er)
-    
-    def upsert_fact(self, fact: Fact, table: str= "facts") -> None:
-        self.db[table].upsert(fact.to_row(), pk="guid")
-        
+        entities= self.get_entities([qid], load_facts= False, table= table)
+        return entities[0] if entities else None
+
+    def get_entities(self, qids: List[str], load_facts: bool= True, table: str= "entities") -> List[Entity]:
+        uniq_qids= list(dict.fromkeys(q for q in qids if q))
+        if not uniq_qids:
+            return []
+
+        rows: Dict[str, dict]= {}
+        with tracer.span("sqlite.get_entities"):
+            for batch in self.chunks(uniq_qids):
+                placeholders= ", ".join("?" for _ in batch)
+                for er in self.db.query(f"SELECT * FROM [{table}] WHERE qid IN ({placeholders})", batch):
+                    rows[er["qid"]]= er
+            facts= self.get_facts_by_subjects(list(rows)) if load_facts else {}
+            stale= time.time() - SQLITE_ACCESS_GRANULARITY
+            self.record_access([q for q, er in rows.items() if (er.get("last_accessed") or 0.0) < stale])
+        tracer.count("sqlite.entity_hits", len(rows))
+        return [self.row_to_entity(rows[q], facts= facts.get(q, []) if load_facts else None) for q in uniq_qids if q in rows]
+
+    def get_entity_summaries(self, qids: List[str], table: str= "entities") -> Dict[str, Dict[str, Any]]:
+        summaries: Dict[str, Dict[str, Any]]= {}
+        with tracer.span("sqlite.get_entity_summaries"):
+            for batch in self.chunks(list(dict.fromkeys(q for q in qids if q))):
+                placeholders= ", ".join("?" for _ in batch)
+                for r in self.db.query(f"SELECT qid, label, description, fetched_at, lastrevid, vector_hash FROM [{table}] WHERE qid IN ({placeholders})", batch):
+                    summaries[r["qid"]]= r
+        return summaries
+
+    def subjects_with_unlabeled_facts(self, after: str= "", limit: int= 200, table: str= "facts") -> List[str]:
+        rows= self.db.execute(
+            f"SELECT DISTINCT subject_qid FROM [{table}] WHERE subject_qid > ? "
+            f"AND (property_label = pid OR (value_qid IS NOT NULL AND value_label IS NULL)) "
+            f"ORDER BY subject_qid LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def get_display_lines(self, subject_qids: List[str], exclude_ranks: Tuple[str, ...]= ("deprecated",), context_only: bool= True, table: str= "facts") -> Dict[str, List[str]]:
+        lines: Dict[str, List[str]]= {qid: [] for qid in subject_qids}
+        excluded= {r.lower() for r in exclude_ranks}
+        with tracer.span("sqlite.get_display_lines"):
+            for batch in self.chunks(list(lines)):
+                placeholders= ", ".join("?" for _ in batch)
+                rows= self.db.query(
+                    f"SELECT subject_qid, pid, property_label, value_type, rank, display_line FROM [{table}] "
+                    f"WHERE subject_qid IN ({placeholders}) ORDER BY rowid",
+                    batch,
+                )
+                for r in rows:
+                    if (r["rank"] or "").lower() in excluded:
+                        continue
+                    if context_only and not is_context_fact(r["pid"], r["property_label"], r["value_type"]):
+                        continue
+                    lines[r["subject_qid"]].append(r["display_line"])
+        return lines
+
     def upsert_entity(self, entity : Entity, table: str= "entities") -> None:
-        for fact in entity.facts:
-            self.upsert_fact(fact)
-        self.db[table].upsert(entity.to_row(), pk= "qid")
+        self.upsert_entities([entity], table= table)
+
+    def upsert_entities(self, entities: List[Entity], table: str= "entities") -> None:
+        if not entities:
+            return
+        qids= list(dict.fromkeys(e.qid for e in entities))
+        entity_rows= [e.to_row() for e in entities]
+        fact_rows= [self.encode_fact_row(f.to_row()) for e in entities for f in e.facts]
+        with tracer.span("sqlite.upsert_entities"), self.db.conn:
+            self.delete_where_in("facts", "subject_qid", qids)
+            self.upsert_rows(table, entity_rows, pk= "qid")
+            self.upsert_rows("facts", fact_rows, pk= "guid")
+            self.index_entity_names(entities)
+        tracer.count("sqlite.facts_written", len(fact_rows))
+
+    def refresh_entities(self, entities: List[Entity], table: str= "entities") -> Dict[str, int]:
+        stats= {"facts_written": 0, "facts_unchanged": 0, "facts_deleted": 0}
+        if not entities:
+            return stats
+        qids= list(dict.fromkeys(e.qid for e in entities))
+        existing: Dict[str, Dict[str, Any]]= {}
+        for batch in self.chunks(qids):
+            placeholders= ", ".join("?" for _ in batch)
+            for fr in self.db.query(f"SELECT * FROM [facts] WHERE subject_qid IN ({placeholders})", batch):
+                existing[fr["guid"]]= fr
+
+        changed_rows= []
+        seen= set()
+        for e in entities:
+            for f in e.facts:
+                row= self.encode_fact_row(f.to_row())
+                seen.add(row["guid"])
+                old= existing.get(row["guid"])
+                if old is not None and all(old.get(k) == v for k, v in row.items() if k != "fetched_at"):
+                    stats["facts_unchanged"] += 1
+                else:
+                    changed_rows.append(row)
+        removed= [guid for guid in existing if guid not in seen]
+        stats["facts_written"]= len(changed_rows)
+        stats["facts_deleted"]= len(removed)
+
+        with tracer.span("sqlite.refresh_entities"), self.db.conn:
+            self.delete_where_in("facts", "guid", removed)
+            self.upsert_rows(table, [e.to_row() for e in entities], pk= "qid")
+            self.upsert_rows("facts", changed_rows, pk= "guid")
+            self.index_entity_names(entities)
+        tracer.count("sqlite.facts_written", len(changed_rows))
+        return stats
+
+    def touch_entities(self, qids: List[str], fetched_at: float, table: str= "entities") -> None:
+        if not qids:
+            return
+        with self.db.conn:
+            self.db.conn.executemany(f"UPDATE [{table}] SET fetched_at= ? WHERE qid= ?", [(fetched_at, q) for q in qids])
+
+    def record_access(self, qids: List[str]) -> None:
+        # Reads only buffer access times; flush_access_times writes them from a background thread so a
+        # cache hit never waits on the write lock held by an import or refresh.
+        self.buffer_times(self.access_times, qids)
+
+    def record_embedding_use(self, keys: List[str]) -> None:
+        self.buffer_times(self.embedding_uses, keys)
+
+    def buffer_times(self, buffer: Dict[str, float], keys: List[str]) -> None:
+        if not keys:
+            return
+        now= time.time()
+        with self.access_lock:
+            for k in keys:
+                if k in buffer or len(buffer) < SQLITE_ACCESS_BUFFER:
+                    buffer[k]= now
+
+    def flush_times(self, buffer: Dict[str, float], sql: str) -> int:
+        with self.access_lock:
+            pending= dict(buffer)
+            buffer.clear()
+        if not pending:
+            return 0
+        try:
+            with self.db.conn:
+                self.db.conn.executemany(sql, [(t, k) for k, t in pending.items()])
+        except sqlite3.OperationalError:
+            with self.access_lock:
+                for k, t in pending.items():
+                    buffer.setdefault(k, t)
+            raise
+        return len(pending)
+
+    def flush_access_times(self, table: str= "entities") -> int:
+        flushed= self.flush_times(self.access_times, f"UPDATE [{table}] SET last_accessed= ? WHERE qid= ?")
+        return flushed + self.flush_embedding_uses()
+
+    def flush_embedding_uses(self, table: str= "embeddings") -> int:
+        return self.flush_times(self.embedding_uses, f"UPDATE [{table}] SET last_used= ? WHERE key= ?")
 
     def delete_fact(self, guid : str, table : str= "facts") -> None:
         self.db[table].delete(guid)
 
     def delete_entity(self, qid: str, table: str= "entities") -> None:
-        facts= self.get_facts_by_subject(qid)
-        for fact in facts:
-            self.delete_fact(fact.guid)
-        self.db[table].delete(qid)
\ No newline at end of file
+        self.delete_entities([qid], table= table)
+
+    def delete_entities(self, qids: List[str], table: str= "entities") -> None:
+        qids= list(dict.fromkeys(q for q in qids if q))
+        if not qids:
+            return
+        with self.db.conn:
+            self.delete_where_in("facts", "subject_qid", qids)
+            self.delete_where_in("entity_names", "qid", qids)
+            self.delete_where_in(table, "qid", qids)
+
+    def get_labels(self, ids: List[str], table: str= "labels") -> Dict[str, Tuple[str, float]]:
+        labels: Dict[str, Tuple[str, float]]= {}
+        for batch in self.chunks(list(ids)):
+            placeholders= ", ".join("?" for _ in batch)
+            rows= self.db.query(f"SELECT id, label, fetched_at FROM [{table}] WHERE id IN ({placeholders})", batch)
+            for r in rows:
+                labels[r["id"]]= (r["label"], r["fetched_at"] or 0.0)
+        return labels
+
+    def upsert_labels(self, labels: Dict[str, str], fetched_at: float, table: str= "labels") -> None:
+        rows= [{"id": wid, "label": label, "fetched_at": fetched_at} for wid, label in labels.items()]
+        with self.db.conn:
+            self.upsert_rows(table, rows, pk= "id")
+
+    def get_embeddings(self, keys: List[str], table: str= "embeddings") -> Dict[str, Tuple[str, bytes]]:
+        found: Dict[str, Tuple[str, bytes]]= {}
+        for batch in self.chunks(list(keys)):
+            placeholders= ", ".join("?" for _ in batch)
+            rows= self.db.query(f"SELECT key, dtype, vector FROM [{table}] WHERE key IN ({placeholders})", batch)
+            for r in rows:
+                found[r["key"]]= (r["dtype"], r["vector"])
+        return found
+
+    def upsert_embeddings(self, rows: List[Dict[str, Any]], table: str= "embeddings") -> None:
+        with self.db.conn:
+            self.upsert_rows(table, rows, pk= "key")
+
+    def count_embeddings(self, table: str= "embeddings") -> int:
+        return self.db[table].count
+
+    def evict_embeddings(self, max_entries: int, table: str= "embeddings") -> int:
+        self.flush_embedding_uses(table= table)
+        excess= self.count_embeddings(table) - max_entries
+        if excess <= 0:
+            return 0
+        with self.db.conn:
+            self.db.conn.execute(
+                f"DELETE FROM [{table}] WHERE key IN (SELECT key FROM [{table}] ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        return excess
+
+    def count_entities(self, table: str= "entities") -> int:
+        return self.db[table].count
+
+    def used_bytes(self) -> int:
+        page_size= self.db.execute("PRAGMA page_size").fetchone()[0]
+        page_count= self.db.execute("PRAGMA page_count").fetchone()[0]
+        freelist= self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def entity_bytes(self) -> int:
+        names= [r[0] for r in self.db.execute(
+            f"SELECT name FROM sqlite_schema WHERE rootpage > 0 AND ("
+            f"tbl_name IN ({', '.join('?' for _ in ENTITY_CACHE_TABLES)}) OR tbl_name LIKE 'entity_names_fts_%')",
+            ENTITY_CACHE_TABLES,
+        ).fetchall()]
+        placeholders= ", ".join("?" for _ in names)
+        try:
+            row= self.db.execute(f"SELECT SUM(pgsize) FROM dbstat WHERE aggregate= TRUE AND name IN ({placeholders})", names).fetchone()
+        except sqlite3.OperationalError:
+            # SQLite built without the dbstat table: fall back to the whole file.
+            return self.used_bytes()
+        return row[0] or 0
+
+    def cache_stats(self) -> Dict[str, Any]:
+        page_size= self.db.execute("PRAGMA page_size").fetchone()[0]
+        compressed= self.db.execute("SELECT COUNT(*) FROM [facts] WHERE typeof(qualifiers_json) = 'blob' OR typeof(references_json) = 'blob'").fetchone()[0]
+        return {
+            "entities": self.count_entities(),
+            "facts": self.db["facts"].count,
+            "compressed_facts": compressed,
+            "embeddings": self.count_embeddings(),
+            "file_bytes": self.db.execute("PRAGMA page_count").fetchone()[0] * page_size,
+            "used_bytes": self.used_bytes(),
+            "entity_bytes": self.entity_bytes(),
+            "free_bytes": self.db.execute("PRAGMA freelist_count").fetchone()[0] * page_size,
+            "auto_vacuum": self.db.execute("PRAGMA auto_vacuum").fetchone()[0],
+        }
+
+    def least_recently_used(self, limit: int, table: str= "entities") -> List[str]:
+        rows= self.db.execute(
+            f"SELECT qid FROM [{table}] ORDER BY COALESCE(last_accessed, fetched_at, 0) LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def evict_entities(self, max_entities: int= SQLITE_MAX_ENTITIES, max_bytes: int= SQLITE_MAX_BYTES, batch_size: int= 500, table: str= "entities") -> List[str]:
+        evicted: List[str]= []
+        with tracer.span("sqlite.evict_entities"):
+            self.flush_access_times(table= table)
+            if max_entities > 0:
+                excess= self.count_entities(table) - max_entities
+                if excess > 0:
+                    victims= self.least_recently_used(excess, table= table)
+                    self.delete_entities(victims, table= table)
+                    evicted += victims
+            if max_bytes > 0:
+                # Only the entity, fact and name-index pages count: embeddings, labels and the query cache have their own limits.
+                used= self.entity_bytes()
+                while used > max_bytes:
+                    estimate= int(self.count_entities(table) * (used - max_bytes) / used) + 1
+                    victims= self.least_recently_used(min(estimate, batch_size), table= table)
+                    if not victims:
+                        break
+                    self.delete_entities(victims, table= table)
+                    evicted += victims
+                    remaining= self.entity_bytes()
+                    if remaining >= used:
+                        break
+                    used= remaining
+        tracer.count("sqlite.entities_evicted", len(evicted))
+        return evicted
+
+    def recompress_facts(self, batch_size: int= 1000, table: str= "facts") -> int:
+        if SQLITE_COMPRESS_MIN_BYTES <= 0:
+            return 0
+        rewritten= 0
+        last_rowid= 0
+        while True:
+            rows= self.db.execute(
+                f"SELECT rowid, qualifiers_json, references_json FROM [{table}] WHERE rowid > ? "
+                f"AND (typeof(qualifiers_json) = 'text' OR typeof(references_json) = 'text') ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size),
+            ).fetchall()
+            if not rows:
+                return rewritten
+            last_rowid= rows[-1][0]
+            updates= [
+                (pack_json_column(q, SQLITE_COMPRESS_MIN_BYTES), pack_json_column(r, SQLITE_COMPRESS_MIN_BYTES), rowid)
+                for rowid, q, r in rows
+            ]
+            with self.db.conn:
+                self.db.conn.executemany(f"UPDATE [{table}] SET qualifiers_json= ?, references_json= ? WHERE rowid= ?", updates)
+            rewritten += len(updates)
+
+    def compact(self, full: bool= False, step_pages: int= 1000) -> Dict[str, int]:
+        before= self.db.execute("PRAGMA page_count").fetchone()[0]
+        with tracer.span("sqlite.compact"):
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.db.execute("PRAGMA optimize")
+            if full or self.db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # auto_vacuum only takes effect on an existing file after a full VACUUM, so this runs once per file.
+                self.db.execute(f"PRAGMA auto_vacuum={SQLITE_AUTO_VACUUM}")
+                self.db.execute("VACUUM")
+            else:
+                free= self.db.execute("PRAGMA freelist_count").fetchone()[0]
+                while free > 0:
+                    # The pragma frees one page per step, so the cursor has to be drained.
+                    self.db.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+                    remaining= self.db.execute("PRAGMA freelist_count").fetchone()[0]
+                    if remaining >= free:
+                        break
+                    free= remaining
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after= self.db.execute("PRAGMA page_count").fetchone()[0]
+        page_size= self.db.execute("PRAGMA page_size").fetchone()[0]
+        return {"pages_before": before, "pages_after": after, "bytes_freed": (before - after) * page_size}
+
+    def get_cached_value(self, key: str, table: str= "query_cache") -> Optional[Tuple[str, float]]:
+        rows= list(self.db.query(f"SELECT value_json, created_at FROM [{table}] WHERE key= ?", [key]))
+        if not rows:
+            return None
+        return rows[0]["value_json"], rows[0]["created_at"]
+
+    def put_cached_value(self, key: str, tier: str, value_json: str, created_at: float, table: str= "query_cache") -> None:
+        with self.db.conn:
+            self.upsert_rows(table, [{"key": key, "tier": tier, "value_json": value_json, "created_at": created_at}], pk= "key")
+
+    def prune_cached_values(self, tier: str, max_entries: int, older_than: float, table: str= "query_cache") -> None:
+        with self.db.conn:
+            self.db.conn.execute(f"DELETE FROM [{table}] WHERE tier= ? AND created_at < ?", (tier, older_than))
+            self.db.conn.execute(
+                f"DELETE FROM [{table}] WHERE key IN ("
+                f"SELECT key FROM [{table}] WHERE tier= ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (tier, max_entries),
+            )
\ No newline at end of file
@@ -0,0 +1,64 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+class StartupLoader:
+
+    def __init__(self, started_at: Optional[float]= None, max_workers: int= 4):
+        self.started_at= started_at if started_at is not None else time.perf_counter()
+        self.pool= ThreadPoolExecutor(max_workers= max_workers, thread_name_prefix= "startup")
+        self.lock= threading.Lock()
+        self.timings: Dict[str, float]= {}
+        self.errors: Dict[str, str]= {}
+        self.futures: Dict[str, Future]= {}
+        self.ready_at: Optional[float]= None
+
+    def mark(self, name: str) -> None:
+        with self.lock:
+            self.timings[name]= time.perf_counter() - self.started_at
+
+    def submit(self, name: str, fn: Callable[[], Any]) -> Future:
+        def load():
+            started= time.perf_counter()
+            try:
+                return fn()
+            except Exception as e:
+                with self.lock:
+                    self.errors[name]= str(e)
+                raise
+            finally:
+                with self.lock:
+                    self.timings[name]= time.perf_counter() - started
+
+        fut= self.pool.submit(load)
+        self.futures[name]= fut
+        fut.add_done_callback(self.check_ready)
+        return fut
+
+    def check_ready(self, _fut: Future) -> None:
+        with self.lock:
+            if self.ready_at is None and all(f.done() for f in self.futures.values()):
+                self.ready_at= time.perf_counter() - self.started_at
+
+    def on_ready(self, callback: Callable[["StartupLoader"], None]) -> None:
+        def run():
+            wait(list(self.futures.values()))
+            self.check_ready(None)
+            callback(self)
+
+        threading.Thread(target= run, name= "startup-report", daemon= True).start()
+
+    def wait(self, timeout: Optional[float]= None) -> bool:
+        done, not_done= wait(list(self.futures.values()), timeout= timeout)
+        return not not_done
+
+    def report(self) -> str:
+        with self.lock:
+            parts= [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+            parts += [f"{name} failed: {error}" for name, error in self.errors.items()]
+            ready= f" (ready after {self.ready_at:.2f}s)" if self.ready_at is not None else ""
+        return f"[startup] {', '.join(parts)}{ready}"
+
+    def close(self) -> None:
+        self.pool.shutdown(wait= False)
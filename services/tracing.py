@@ -0,0 +1,201 @@
+from collections import defaultdict
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+TRACE_ENABLED= os.getenv("TRACE_ENABLED", "0") == "1"
+TRACE_FILE= os.getenv("TRACE_FILE")
+HISTOGRAM_BUCKETS= (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class NoopSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NOOP_SPAN= NoopSpan()
+
+class Trace:
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name= name
+        self.attrs= dict(attrs)
+        self.started_at= time.time()
+        self.started= time.perf_counter()
+        self.spans: List[Dict[str, Any]]= []
+        self.counters: Dict[str, float]= defaultdict(float)
+        self.lock= threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "name": self.name,
+                "started_at": self.started_at,
+                "duration": time.perf_counter() - self.started,
+                "attrs": self.attrs,
+                "spans": list(self.spans),
+                "counters": dict(self.counters),
+            }
+
+class Span:
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer= tracer
+        self.name= name
+        self.started= 0.0
+
+    def __enter__(self):
+        self.started= time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.started, started= self.started)
+        return False
+
+class Tracer:
+
+    def __init__(self, enabled: bool= TRACE_ENABLED, trace_file: Optional[str]= TRACE_FILE):
+        self.enabled= enabled
+        self.trace_file= trace_file
+        self.current: contextvars.ContextVar= contextvars.ContextVar("trace", default= None)
+        self.lock= threading.Lock()
+        self.histograms: Dict[str, List[int]]= {}
+        self.sums: Dict[str, float]= defaultdict(float)
+        self.counts: Dict[str, int]= defaultdict(int)
+        self.counters: Dict[str, float]= defaultdict(float)
+        self.server: Optional[ThreadingHTTPServer]= None
+
+    def enable(self, trace_file: Optional[str]= None) -> None:
+        self.enabled= True
+        if trace_file:
+            self.trace_file= trace_file
+
+    def disable(self) -> None:
+        self.enabled= False
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name)
+
+    def record(self, name: str, duration: float, started: Optional[float]= None) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            buckets= self.histograms.get(name)
+            if buckets is None:
+                buckets= self.histograms[name]= [0] * (len(HISTOGRAM_BUCKETS) + 1)
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self.sums[name] += duration
+            self.counts[name] += 1
+        trace= self.current.get()
+        if trace is not None:
+            offset= (started if started is not None else time.perf_counter() - duration) - trace.started
+            with trace.lock:
+                trace.spans.append({"name": name, "start": round(offset, 6), "duration": round(duration, 6)})
+
+    def count(self, name: str, value: float= 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+        trace= self.current.get()
+        if trace is not None:
+            with trace.lock:
+                trace.counters[name] += value
+
+    def active(self) -> bool:
+        return self.current.get() is not None
+
+    def start_trace(self, name: str, **attrs: Any):
+        if not self.enabled:
+            return None
+        trace= Trace(name, attrs)
+        return trace, self.current.set(trace)
+
+    def end_trace(self, handle, **attrs: Any) -> Optional[Dict[str, Any]]:
+        if handle is None:
+            return None
+        trace, token= handle
+        try:
+            self.current.reset(token)
+        except ValueError:
+            self.current.set(None)
+        trace.attrs.update(attrs)
+        data= trace.to_dict()
+        self.record(trace.name, data["duration"])
+        if self.trace_file:
+            line= json.dumps(data, ensure_ascii= False)
+            with self.lock:
+                with open(self.trace_file, "a", encoding= "utf-8") as f:
+                    f.write(line + "\n")
+        return data
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "histograms": {
+                    name: {
+                        "buckets": dict(zip([str(b) for b in HISTOGRAM_BUCKETS] + ["+Inf"], counts)),
+                        "sum": self.sums[name],
+                        "count": self.counts[name],
+                    }
+                    for name, counts in self.histograms.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def render_prometheus(self) -> str:
+        snap= self.snapshot()
+        lines= [
+            "# HELP wikidata_assistant_stage_seconds Time spent per pipeline stage.",
+            "# TYPE wikidata_assistant_stage_seconds histogram",
+        ]
+        for name, h in sorted(snap["histograms"].items()):
+            cumulative= 0
+            for bound, n in h["buckets"].items():
+                cumulative += n
+                lines.append(f'wikidata_assistant_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'wikidata_assistant_stage_seconds_sum{{stage="{name}"}} {h["sum"]}')
+            lines.append(f'wikidata_assistant_stage_seconds_count{{stage="{name}"}} {h["count"]}')
+        lines.append("# TYPE wikidata_assistant_events_total counter")
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f'wikidata_assistant_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port: int, host: str= "127.0.0.1") -> None:
+        tracer= self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body= tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server= ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads= True
+        threading.Thread(target= self.server.serve_forever, name= "metrics", daemon= True).start()
+
+tracer= Tracer()
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple
+
+class VectorStore(ABC):
+
+    @abstractmethod
+    def ensure_collection(self, collection: str, size: int) -> None:
+        ...
+
+    @abstractmethod
+    def upsert(self, collection: str, qids: List[str], vectors: List[Any], payloads: List[Dict[str, Any]], wait: bool= True) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, collection: str, qids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, collection: str, vector: Any, limit: int, min_score: float) -> List[Tuple[str, float]]:
+        ...
+
+    def close(self) -> None:
+        pass